@@ -4,93 +4,217 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_caching import Cache
 from dotenv import load_dotenv
 import os
 import redis
 
-db = SQLAlchemy()
+# Sessions route eligible reads to replicas when any are configured
+from .utils.db_routing import RoutingSession
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 cache = Cache()
 
-# Load environment for Redis URL
-load_dotenv()
-redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-
-# Create limiter with Redis storage
-try:
-    limiter = Limiter(
-        key_func=get_remote_address,
-        storage_uri=redis_url,
-        default_limits=["1000 per hour"]
-    )
-    print(f"✅ Rate limiting configured with Redis storage: {redis_url}")
-except Exception as e:
-    print(f"⚠️ Failed to configure Redis for rate limiting, using in-memory: {e}")
-    limiter = Limiter(key_func=get_remote_address)
+# Storage is configured in create_app (RATELIMIT_STORAGE_URI), not at import
+from .utils.rate_limit import rate_limit_key
+limiter = Limiter(key_func=rate_limit_key)
 
 def create_app(config_name='development'):
     load_dotenv()
     app = Flask(__name__)
     
+    # Client IPs (rate limits, security logs) come from request.remote_addr.
+    # Behind proxies, ProxyFix rewrites it from the last TRUSTED_PROXY_COUNT
+    # X-Forwarded-For hops; entries a client adds itself are never trusted.
+    app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+    if app.config['TRUSTED_PROXY_COUNT']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        trusted = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted, x_proto=trusted)
+    
+    # orjson-backed JSON responses (stdlib json when orjson isn't installed)
+    from .utils.serialization import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # Configuration
+    redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///catelog.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # TimedQueuePool records checkout waits for load shedding (utils/load_shedding.py)
+    from .utils.load_shedding import TimedQueuePool
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': TimedQueuePool,
         'pool_size': 20,
         'pool_recycle': 3600,
         'pool_pre_ping': True,
         'max_overflow': 30
     }
     
-    # Redis configuration
-    app.config['CACHE_TYPE'] = 'RedisCache'
+    # Optional read replicas (comma-separated URLs), each added as a replica_N bind
+    replica_urls = [u.strip() for u in os.getenv('SQLALCHEMY_REPLICA_URLS', '').split(',') if u.strip()]
+    if replica_urls:
+        from .utils.db_routing import replica_binds
+        app.config['SQLALCHEMY_BINDS'] = replica_binds(
+            replica_urls, app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+            connect_timeout=int(os.getenv('REPLICA_CONNECT_TIMEOUT', 2))
+        )
+    app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.getenv('REPLICA_CHECK_INTERVAL', 10))
+    app.config['REPLICA_PIN_SECONDS'] = float(os.getenv('REPLICA_PIN_SECONDS', 5))
+    
+    # Optional sharding of the per-user log tables, each shard a shard_N bind
+    # (comma-separated URLs, or SQLITE_SHARDS=N local SQLite files as stand-ins)
+    from .utils.sharding import shard_binds, sqlite_shard_urls
+    shard_urls = [u.strip() for u in os.getenv('SQLALCHEMY_SHARD_URLS', '').split(',') if u.strip()]
+    if not shard_urls and int(os.getenv('SQLITE_SHARDS', 0)):
+        shard_urls = sqlite_shard_urls(int(os.getenv('SQLITE_SHARDS')))
+    if shard_urls:
+        app.config.setdefault('SQLALCHEMY_BINDS', {}).update(
+            shard_binds(shard_urls, app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        )
+    
+    # Redis configuration (in-process L1 in front of Redis, see utils/cache_backend.py)
+    app.config['CACHE_TYPE'] = 'app.utils.cache_backend.TieredCache'
     app.config['CACHE_REDIS_URL'] = redis_url
     app.config['CACHE_DEFAULT_TIMEOUT'] = 300
+    app.config['CACHE_L1_MAX_ENTRIES'] = int(os.getenv('CACHE_L1_MAX_ENTRIES', 5000))
+    app.config['CACHE_L1_TTL'] = int(os.getenv('CACHE_L1_TTL', 30))
+    app.config['CACHE_REDIS_RETRY_AFTER'] = int(os.getenv('CACHE_REDIS_RETRY_AFTER', 30))
+    # Default timeouts by key prefix, used when a caller doesn't pass one
+    app.config['CACHE_NAMESPACE_TIMEOUTS'] = {
+        'user': int(os.getenv('USER_CACHE_TTL', 300)),
+        'tracker': 600,
+        'dashboard': 300,
+    }
     
-    # Rate limiting configuration
-    app.config['RATELIMIT_STORAGE_URL'] = redis_url
-    app.config['RATELIMIT_DEFAULT'] = "1000 per hour"
+    # Rate limiting configuration: Redis behind a circuit breaker, falling back
+    # to per-worker in-memory counters (see utils/rate_limit.py)
+    app.config['RATELIMIT_STORAGE_URI'] = f"fallback+{redis_url}"
+    app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+        'socket_timeout': float(os.getenv('RATELIMIT_REDIS_TIMEOUT', 0.1)),
+        'socket_connect_timeout': float(os.getenv('RATELIMIT_REDIS_TIMEOUT', 0.1)),
+        'failure_threshold': int(os.getenv('RATELIMIT_FAILURE_THRESHOLD', 3)),
+        'recovery_timeout': int(os.getenv('RATELIMIT_RECOVERY_TIMEOUT', 30)),
+    }
+    app.config['RATELIMIT_DEFAULT'] = os.getenv('RATELIMIT_DEFAULT', "1000 per hour")
+    app.config['RATELIMIT_SWALLOW_ERRORS'] = True
+    # Only turned off for load tests (loadtest/run.py)
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
     
     # CORS
     CORS(app, 
          origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','),
          supports_credentials=True,
-         allow_headers=['Content-Type', 'Authorization'],
+         allow_headers=['Content-Type', 'Authorization', 'X-Request-ID', 'traceparent'],
+         expose_headers=['X-Request-ID'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    
+    # Under gunicorn --preload, background threads start in each worker after
+    # fork (gunicorn.conf.py sets DEFER_WORKER_THREADS, see utils/worker_boot.py)
+    app.config['DEFER_WORKER_THREADS'] = os.getenv('DEFER_WORKER_THREADS', 'false').lower() == 'true'
+    app.config['WARM_DB_CONNECTIONS'] = int(os.getenv('WARM_DB_CONNECTIONS', 2))
+    from .utils.worker_boot import worker_boot
+    worker_boot.init_app(app, db)
+    from .utils.db_routing import replica_router
+    replica_router.init_app(app, db)
+    from .utils.sharding import shard_router
+    shard_router.init_app(app, db)
+    from .utils.seed import seed_command
+    app.cli.add_command(seed_command)
     cache.init_app(app)
+    
+    # Request tracing to a local OTLP/JSON file (sampled). Registered before
+    # the limiter so its before_request check is inside the request span.
+    app.config['TRACING_ENABLED'] = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    app.config['TRACE_SAMPLE_RATE'] = float(os.getenv('TRACE_SAMPLE_RATE', 0.1))
+    app.config['TRACE_FILE'] = os.getenv('TRACE_FILE', 'logs/traces.jsonl')
+    from .utils.tracing import tracer
+    tracer.init_app(app, db)
+    
+    # Prometheus metrics at /metrics (needs prometheus_client). Registered
+    # before the limiter, whose key function loads the user, so that query
+    # is counted with the request. Production must set METRICS_TOKEN, or
+    # anyone who can reach the app could read its internals there.
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    production = config_name == 'production' or os.getenv('FLASK_ENV') == 'production'
+    if production and not app.config['METRICS_TOKEN']:
+        raise RuntimeError("METRICS_TOKEN must be set in production (it protects /metrics)")
+    from .utils.metrics import init_metrics
+    init_metrics(app, db)
+    
+    # Opt-in per-request SQL profiling (query counts, N+1, slow queries),
+    # also set up before the limiter so the user load is profiled
+    app.config['SQL_PROFILER_ENABLED'] = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+    app.config['SQL_SLOW_QUERY_MS'] = int(os.getenv('SQL_SLOW_QUERY_MS', 100))
+    from .utils.sql_profiler import sql_profiler
+    sql_profiler.init_app(app, db)
+    
+    # Shed reads and exports with 503 + Retry-After when this worker's in-flight
+    # requests or DB pool are saturated; registered before the limiter and
+    # login so a shed request costs no Redis or database round trip
+    app.config['LOAD_SHED_ENABLED'] = os.getenv('LOAD_SHED_ENABLED', 'true').lower() == 'true'
+    app.config['LOAD_SHED_MAX_IN_FLIGHT'] = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT', 32))
+    app.config['LOAD_SHED_POOL_WAIT_MS'] = float(os.getenv('LOAD_SHED_POOL_WAIT_MS', 250))
+    app.config['LOAD_SHED_LOW_AT'] = float(os.getenv('LOAD_SHED_LOW_AT', 0.7))
+    app.config['LOAD_SHED_NORMAL_AT'] = float(os.getenv('LOAD_SHED_NORMAL_AT', 0.9))
+    app.config['LOAD_SHED_RETRY_AFTER'] = int(os.getenv('LOAD_SHED_RETRY_AFTER', 5))
+    from .utils.load_shedding import load_shedder
+    load_shedder.init_app(app, db)
+    
     limiter.init_app(app)
+    from .utils.rate_limit import add_rate_limit_timing
+    app.after_request(add_rate_limit_timing)
     
     # Login manager setup
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
+    # Password hashing (runs in a per-worker process pool)
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    from .utils.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    # Cache the user row loaded on every authenticated request
+    from .utils.user_cache import user_cache
+    user_cache.init_app(app)
+
+    # Write-behind last_login / last_seen timestamps
+    app.config['ACTIVITY_FLUSH_INTERVAL'] = int(os.getenv('ACTIVITY_FLUSH_INTERVAL', 60))
+    from .utils.activity import activity_recorder
+    activity_recorder.init_app(app)
+
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(user_id)
+        with tracer.span('auth.load_user'):
+            return user_cache.load(user_id)
 
     from .routes.auth import auth_bp
     from .routes.feeding import feeding_bp
     from .routes.medication import medlog_bp
     from .routes.report import report_bp
     from .routes.tracker import tracker_bp
+    from .routes.admin import admin_bp
+    from .routes.dashboard import dashboard_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(feeding_bp, url_prefix='/api/feeding')
     app.register_blueprint(medlog_bp, url_prefix='/api/medication_log')
     app.register_blueprint(report_bp, url_prefix='/api/report')
     app.register_blueprint(tracker_bp, url_prefix='/api/tracker')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     
-    # Setup logging
+    # Setup logging (JSON lines written by a background QueueListener)
+    app.config['LOG_DEBUG_SAMPLE_RATE'] = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+    app.config['LOG_REQUESTS'] = os.getenv('LOG_REQUESTS', 'true').lower() == 'true'
     from .utils.logger import setup_logging
     setup_logging(app)
     
@@ -100,11 +224,17 @@ def create_app(config_name='development'):
     
     app.logger.info("Registered all blueprints")
 
+    # Celery for reports and maintenance (eager, in-process, without a broker)
+    from .celery_app import celery_config, celery_init_app
+    app.config['CELERY'] = celery_config(app)
+    celery_init_app(app)
+
     # Start the tracker scheduler only in production or when specified
     if config_name == 'production' or os.getenv('START_SCHEDULER', 'false').lower() == 'true':
+        # Every worker runs the loop, but only the Redis lease holder executes jobs
         from .utils.schedule import start_scheduler
-        start_scheduler()
-        app.logger.info("Tracker scheduler started")
+        worker_boot.start_in_worker(lambda: start_scheduler(app))
+        app.logger.info("Tracker scheduler deferred to workers" if worker_boot.defer_threads else "Tracker scheduler started")
 
     @app.route('/')
     def index():
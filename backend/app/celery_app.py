@@ -0,0 +1,78 @@
+import os
+from celery import Celery, Task
+from celery.signals import worker_process_init
+
+# Queue names; each gets its own worker (and concurrency) in docker-compose.prod.yml
+REPORTS_QUEUE = 'reports'
+MAINTENANCE_QUEUE = 'maintenance'
+
+def celery_config(app):
+    """Celery settings for the app.
+
+    Without a broker (development, tests) tasks run eagerly in the calling
+    process, so everything works with no worker running.
+    """
+    broker_url = os.getenv('CELERY_BROKER_URL')
+    eager = (
+        app.config.get('TESTING', False)
+        or not broker_url
+        or os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true'
+    )
+    return {
+        'broker_url': broker_url or 'memory://',
+        'result_backend': os.getenv('CELERY_RESULT_BACKEND', broker_url),
+        'task_always_eager': eager,
+        'task_eager_propagates': True,
+        'task_ignore_result': True,
+        'task_serializer': 'json',
+        'accept_content': ['json'],
+        'task_default_queue': MAINTENANCE_QUEUE,
+        'task_routes': {
+            'app.tasks.generate_report': {'queue': REPORTS_QUEUE},
+            'app.tasks.cleanup_old_trackers': {'queue': MAINTENANCE_QUEUE},
+            'app.tasks.cleanup_inactive_users': {'queue': MAINTENANCE_QUEUE},
+            'app.tasks.precreate_trackers': {'queue': MAINTENANCE_QUEUE},
+        },
+        # Long tasks: hand out one at a time and only ack once finished
+        'worker_prefetch_multiplier': 1,
+        'task_acks_late': True,
+        'task_reject_on_worker_lost': True,
+        'worker_max_tasks_per_child': 200,
+        'broker_transport_options': {'visibility_timeout': 3600},
+    }
+
+def celery_init_app(app):
+    """Create the Celery app bound to this Flask app; tasks run inside its app context"""
+
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app.config_from_object(app.config['CELERY'])
+    celery_app.set_default()
+    app.extensions['celery'] = celery_app
+
+    # Register the tasks with this app
+    from app import tasks  # noqa: F401
+
+    @worker_process_init.connect(weak=False)
+    def init_worker_process(**kwargs):
+        # Prefork children are forks of the process that ran create_app: give
+        # them their own pools, log/trace writers and background threads
+        from app.utils.worker_boot import worker_boot
+        worker_boot.worker_started(warm_up=False)
+
+    return celery_app
+
+def queue_depth(app, queue):
+    """Messages waiting in a queue (Redis broker only), or None if unknown"""
+    celery_app = app.extensions.get('celery')
+    if celery_app is None or celery_app.conf.task_always_eager:
+        return None
+    try:
+        import redis
+        return redis.Redis.from_url(celery_app.conf.broker_url, socket_timeout=0.5).llen(queue)
+    except Exception:
+        return None
@@ -1,12 +1,16 @@
 from datetime import datetime, date, timedelta
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import literal, func
 import uuid
 from app import db
+from app.utils.db_types import GUID
+from app.utils.passwords import password_hasher
+from app.utils.sharding import shard_router
+from app.utils.serialization import compile_serializer, iso
 
 class User(UserMixin, db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(GUID(), primary_key=True, default=lambda: str(uuid.uuid4()))
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     first_name = db.Column(db.String(100))
@@ -14,7 +18,8 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_login = db.Column(db.DateTime)
+    last_login = db.Column(db.DateTime, index=True)
+    last_seen = db.Column(db.DateTime, index=True)  # written behind by ActivityRecorder
     timezone = db.Column(db.String(50), default='UTC')
     
     # Cat profile information
@@ -30,27 +35,46 @@ class User(UserMixin, db.Model):
     daily_trackers = db.relationship('DailyFeedingTracker', backref='user', lazy='dynamic', cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured algorithm/cost"""
+        return password_hasher.needs_rehash(self.password_hash)
+
+    def delete_account(self):
+        """Delete the user and all their logs, which may live on a shard.
+
+        The logs are removed with bulk deletes routed to the user's shard (the
+        ORM cascade can't tell which shard to load them from), then the user.
+        """
+        user_id = self.id
+        with shard_router.for_user(user_id):
+            for model in (FeedingLog, MedicationLog, DailyFeedingTracker):
+                model.query.filter(model.user_id == user_id).delete(synchronize_session=False)
+            db.session.delete(self)
+            db.session.commit()
+
+    serializer = staticmethod(compile_serializer('serialize_user', {
+        'id': 'o.id',
+        'email': 'o.email',
+        'first_name': 'o.first_name',
+        'last_name': 'o.last_name',
+        'cat_name': 'o.cat_name',
+        'cat_breed': 'o.cat_breed',
+        'cat_age': 'o.cat_age',
+        'cat_weight': 'o.cat_weight',
+        'daily_target_ml': 'o.daily_target_ml',
+        'timezone': 'o.timezone',
+        'created_at': iso('created_at'),
+        'last_login': iso('last_login'),
+        'is_active': 'o.is_active'
+    }))
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'email': self.email
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'cat_name': self.cat_name,
-            'cat_breed': self.cat_breed,
-            'cat_age': self.cat_age,
-            'cat_weight': self.cat_weight,
-            'daily_target_ml': self.daily_target_ml,
-            'timezone': self.timezone,
-            'created_at': self.created_at.isoformat(),
-            'last_login': self.last_login.isoformat() if self.last_login else None,
-            'is_active': self.is_active
-        }
+        return self.serializer(self)
 
     def check_activity(self):
         """Check user activity and mark for deactivation/deletion based on last login"""
@@ -72,52 +96,102 @@ class User(UserMixin, db.Model):
         return None
     
     @classmethod
-    def cleanup_inactive_users(cls):
-        """Class method to find and handle inactive users"""
-        inactive_users = cls.query.filter(cls.is_active == True).all()
-        users_to_delete = []
+    def inactive_since(cls, cutoff):
+        """Filter for users with no login or activity since cutoff (never-logged-in users excluded)"""
+        # Spelled out instead of coalesce() so both branches can use their index
+        return db.or_(
+            cls.last_seen < cutoff,
+            db.and_(cls.last_seen.is_(None), cls.last_login < cutoff)
+        )
+
+    @classmethod
+    def cleanup_inactive_users(cls, batch_size=500):
+        """Deactivate users idle for 60+ days and delete users idle for 120+ days.
+
+        Runs as set-based statements so the cost scales with the number of
+        affected users rather than the whole user table. Both steps are
+        committed in chunks of ``batch_size`` users, and each chunk is dropped
+        from the user session cache.
+        """
+        from app.utils.activity import activity_recorder
+        from app.utils.user_cache import user_cache
+
+        # Make sure buffered logins/activity are in the table before judging anyone
+        activity_recorder.flush()
+
+        now = datetime.utcnow()
+        deactivate_before = now - timedelta(days=60)
+        delete_before = now - timedelta(days=120)
+
+        # Deactivate in chunks too: the ids are needed to drop cached sessions,
+        # which would otherwise keep authenticating until they expire
         deactivated_count = 0
-        
-        for user in inactive_users:
-            status = user.check_activity()
-            if status == 'deactivated':
-                deactivated_count += 1
-            elif status == 'delete':
-                users_to_delete.append(user)
-        
-        # Delete users marked for deletion
-        deleted_count = len(users_to_delete)
-        for user in users_to_delete:
-            db.session.delete(user)
-        
-        if deactivated_count > 0 or deleted_count > 0:
+        while True:
+            user_ids = [row[0] for row in db.session.query(cls.id).filter(
+                cls.is_active == True,
+                cls.inactive_since(deactivate_before)
+            ).limit(batch_size).all()]
+            if not user_ids:
+                break
+            deactivated_count += cls.query.filter(
+                cls.id.in_(user_ids)
+            ).update({cls.is_active: False}, synchronize_session=False)
             db.session.commit()
-        
-        return {
-            'deactivated': deactivated_count,
-            'deleted': deleted_count
-        }
+            user_cache.invalidate_many(user_ids)
+
+        # Bulk deletes skip ORM cascades, so remove dependent rows explicitly
+        dependents = [
+            (FeedingLog, 'deleted_feeding_logs'),
+            (MedicationLog, 'deleted_medication_logs'),
+            (DailyFeedingTracker, 'deleted_trackers'),
+        ]
+        result = {'deactivated': deactivated_count, 'deleted': 0}
+        result.update({key: 0 for _, key in dependents})
+
+        while True:
+            user_ids = [row[0] for row in db.session.query(cls.id).filter(
+                cls.inactive_since(delete_before)
+            ).limit(batch_size).all()]
+            if not user_ids:
+                break
+
+            # Logs may live on other databases (shards) than the users
+            for shard, shard_user_ids in shard_router.group_by_shard(user_ids).items():
+                with shard_router.on_shard(shard):
+                    for model, key in dependents:
+                        result[key] += model.query.filter(
+                            model.user_id.in_(shard_user_ids)
+                        ).delete(synchronize_session=False)
+            result['deleted'] += cls.query.filter(
+                cls.id.in_(user_ids)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            user_cache.invalidate_many(user_ids)
+
+        return result
 
 class FeedingLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False, index=True)
+    user_id = db.Column(GUID(), db.ForeignKey('user.id'), nullable=False, index=True)
     amount_ml = db.Column(db.Float, nullable=False)
     flushed_before = db.Column(db.Boolean, default=False)
     flushed_after = db.Column(db.Boolean, default=False)
     time_given = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    serializer = staticmethod(compile_serializer('serialize_feeding_log', {
+        "id": "o.id",
+        "amount_ml": "o.amount_ml",
+        "flushed_before": "o.flushed_before",
+        "flushed_after": "o.flushed_after",
+        "time_given": iso("time_given")
+    }))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "amount_ml": self.amount_ml,
-            "flushed_before": self.flushed_before,
-            "flushed_after": self.flushed_after,
-            "time_given": self.time_given.isoformat()
-        }
+        return self.serializer(self)
 
 class MedicationLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False, index=True)
+    user_id = db.Column(GUID(), db.ForeignKey('user.id'), nullable=False, index=True)
     medication_name = db.Column(db.String(100), nullable=False)
     dosage = db.Column(db.String(50), nullable=False)  # e.g., "10mg", "1 tablet", "5ml"
     amount_ml = db.Column(db.Float, nullable=False)  # Amount of liquid used to give medication
@@ -127,22 +201,24 @@ class MedicationLog(db.Model):
     flushed_after = db.Column(db.Boolean, default=False)
     time_given = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    serializer = staticmethod(compile_serializer('serialize_medication_log', {
+        "id": "o.id",
+        "medication_name": "o.medication_name",
+        "dosage": "o.dosage",
+        "amount_ml": "o.amount_ml",
+        "route": "o.route",
+        "notes": "o.notes",
+        "flushed_before": "o.flushed_before",
+        "flushed_after": "o.flushed_after",
+        "time_given": iso("time_given")
+    }))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "medication_name": self.medication_name,
-            "dosage": self.dosage,
-            "amount_ml": self.amount_ml,
-            "route": self.route,
-            "notes": self.notes,
-            "flushed_before": self.flushed_before,
-            "flushed_after": self.flushed_after,
-            "time_given": self.time_given.isoformat()
-        }
+        return self.serializer(self)
 
 class DailyFeedingTracker(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False, index=True)
+    user_id = db.Column(GUID(), db.ForeignKey('user.id'), nullable=False, index=True)
     target_date = db.Column(db.Date, nullable=False, default=date.today, index=True)
     daily_target_ml = db.Column(db.Float, nullable=False, default=210.0)
     remaining_ml = db.Column(db.Float, nullable=False)
@@ -161,8 +237,83 @@ class DailyFeedingTracker(db.Model):
         self.user_id = user_id
         self.daily_target_ml = daily_target_ml
         self.remaining_ml = daily_target_ml
+        # Column defaults only apply at flush; add_feeding() may run before that
+        self.total_fed_ml = 0.0
+        self.feeding_count = 0
         self.target_date = target_date or date.today()
 
+    @classmethod
+    def precreate_for_date(cls, target_date):
+        """Create trackers for every active user on target_date in one statement.
+
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING, so users who already have
+        a tracker for that day are left untouched. Returns the number created.
+        """
+        if shard_router.enabled:
+            return cls._precreate_on_shards(target_date)
+
+        insert = cls._conflict_insert(db.session.get_bind().dialect.name)
+        now = datetime.utcnow()
+        target_ml = func.coalesce(User.daily_target_ml, 210.0)
+        active_users = db.select(
+            User.id,
+            literal(target_date, db.Date),
+            target_ml,
+            target_ml,
+            literal(0.0, db.Float),
+            literal(0, db.Integer),
+            literal(now, db.DateTime),
+            literal(now, db.DateTime)
+        ).where(User.is_active == True)
+
+        stmt = insert(cls).from_select(
+            ['user_id', 'target_date', 'daily_target_ml', 'remaining_ml',
+             'total_fed_ml', 'feeding_count', 'last_updated', 'created_at'],
+            active_users
+        ).on_conflict_do_nothing(index_elements=['user_id', 'target_date'])
+
+        result = db.session.execute(stmt)
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def _precreate_on_shards(cls, target_date, batch_size=500):
+        """precreate_for_date when trackers are sharded: users are read from the
+        primary and inserted per shard, since INSERT ... SELECT can't span databases"""
+        now = datetime.utcnow()
+        users = db.session.query(User.id, func.coalesce(User.daily_target_ml, 210.0)).filter(
+            User.is_active == True
+        ).all()
+
+        created = 0
+        for key, rows in shard_router.group_by_shard(users, lambda row: row[0]).items():
+            insert = cls._conflict_insert(db.engines[key].dialect.name)
+            with shard_router.on_shard(key):
+                for i in range(0, len(rows), batch_size):
+                    values = [{
+                        'user_id': user_id, 'target_date': target_date,
+                        'daily_target_ml': target_ml, 'remaining_ml': target_ml,
+                        'total_fed_ml': 0.0, 'feeding_count': 0,
+                        'last_updated': now, 'created_at': now,
+                    } for user_id, target_ml in rows[i:i + batch_size]]
+                    stmt = insert(cls).values(values).on_conflict_do_nothing(
+                        index_elements=['user_id', 'target_date']
+                    )
+                    created += db.session.execute(stmt).rowcount
+        db.session.commit()
+        return created
+
+    @staticmethod
+    def _conflict_insert(dialect):
+        """The dialect's insert() construct, which supports ON CONFLICT DO NOTHING"""
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            raise NotImplementedError(f"Bulk tracker creation not supported on {dialect}")
+        return insert
+
     def add_feeding(self, amount_ml):
         """Add a feeding and update remaining amount"""
         self.total_fed_ml += amount_ml
@@ -194,17 +345,20 @@ class DailyFeedingTracker(db.Model):
         """Check if this tracker is for a past date"""
         return self.target_date < date.today()
 
+    # Same results as get_progress_percentage/is_completed/is_overdue, inlined
+    serializer = staticmethod(compile_serializer('serialize_daily_tracker', {
+        "id": "o.id",
+        "target_date": iso("target_date"),
+        "daily_target_ml": "o.daily_target_ml",
+        "remaining_ml": "o.remaining_ml",
+        "total_fed_ml": "o.total_fed_ml",
+        "feeding_count": "o.feeding_count",
+        "progress_percentage": "(100 if o.daily_target_ml == 0 else min(100, (o.total_fed_ml / o.daily_target_ml) * 100))",
+        "is_completed": "o.total_fed_ml >= o.daily_target_ml",
+        "is_overdue": "o.target_date < (today or date.today())",
+        "last_updated": iso("last_updated"),
+        "created_at": iso("created_at")
+    }))
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "target_date": self.target_date.isoformat(),
-            "daily_target_ml": self.daily_target_ml,
-            "remaining_ml": self.remaining_ml,
-            "total_fed_ml": self.total_fed_ml,
-            "feeding_count": self.feeding_count,
-            "progress_percentage": self.get_progress_percentage(),
-            "is_completed": self.is_completed(),
-            "is_overdue": self.is_overdue(),
-            "last_updated": self.last_updated.isoformat(),
-            "created_at": self.created_at.isoformat()
-        }
\ No newline at end of file
+        return self.serializer(self)
\ No newline at end of file
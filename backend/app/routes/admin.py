@@ -0,0 +1,84 @@
+from functools import wraps
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+import redis
+from app import cache
+from app.utils.schedule import get_scheduler
+from app.utils.user_cache import user_cache
+from app.utils.rate_limit import get_rate_limit_stats
+from app.utils.db_routing import replica_router
+from app.utils.load_shedding import load_shedder
+from app.utils.worker_boot import worker_boot
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(f):
+    """Restrict a route to admin users"""
+    @wraps(f)
+    @login_required
+    def wrapper(*args, **kwargs):
+        # Simple admin check - you might want to add proper role-based access
+        if not current_user.email.endswith('@admin.com'):  # Replace with your admin logic
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/scheduler/jobs', methods=['GET'])
+@admin_required
+def get_scheduler_jobs():
+    """Get schedule, last run, duration and row count for every scheduled job"""
+    try:
+        scheduler = get_scheduler()
+        return jsonify({
+            'leader': scheduler.lease.is_leader,
+            'jobs': scheduler.get_job_states()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Failed to get scheduler jobs'}), 500
+
+@admin_bp.route('/scheduler/jobs/<name>/run', methods=['POST'])
+@admin_required
+def run_scheduler_job(name):
+    """Queue a job to run on the scheduler leader's next tick"""
+    try:
+        get_scheduler().request_run(name)
+        return jsonify({'message': f'Job {name} queued', 'job': name}), 202
+    except KeyError:
+        return jsonify({'error': f'Unknown job: {name}'}), 404
+    except redis.RedisError:
+        return jsonify({'error': 'Scheduler queue unavailable'}), 503
+    except Exception as e:
+        return jsonify({'error': 'Failed to queue job'}), 500
+
+@admin_bp.route('/cache/users', methods=['GET'])
+@admin_required
+def get_user_cache_stats():
+    """Get user-session cache hit rate for this worker process"""
+    return jsonify({'user_cache': user_cache.stats()}), 200
+
+@admin_bp.route('/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get per-namespace L1/Redis hit counters for this worker process"""
+    backend_stats = getattr(cache.cache, 'get_stats', None)
+    if backend_stats is None:
+        return jsonify({'error': 'Cache backend does not report statistics'}), 404
+    return jsonify({'cache': backend_stats()}), 200
+
+@admin_bp.route('/ratelimit/stats', methods=['GET'])
+@admin_required
+def get_rate_limit_stats_route():
+    """Get limiter storage overhead and fallback counters for this worker process"""
+    return jsonify({'rate_limit': get_rate_limit_stats()}), 200
+
+@admin_bp.route('/db/replicas', methods=['GET'])
+@admin_required
+def get_replica_status():
+    """Get read-replica health and lag as last seen by this worker process"""
+    return jsonify({'enabled': replica_router.enabled, 'replicas': replica_router.get_status()}), 200
+
+@admin_bp.route('/load/stats', methods=['GET'])
+@admin_required
+def get_load_stats():
+    """Get in-flight requests, pool saturation, shed counts and boot timings for this worker process"""
+    return jsonify({'load': load_shedder.stats(), 'boot': worker_boot.boot}), 200
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify, session
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import User
 from app import db
+from app.utils.user_cache import user_cache
+from app.utils.activity import activity_recorder
 import re
 from datetime import datetime
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
@@ -108,9 +110,15 @@ def login():
             # user.check_activity()
             return jsonify({'error': 'Account is deactivated'}), 401
         
-        # Update last login
+        # Upgrade hashes made with an older algorithm/cost while we have the password
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
+        
+        # Update last login (buffered and written to the table in bulk later)
+        activity_recorder.record_login(user.id)
         user.last_login = datetime.utcnow()
-        db.session.commit()
+        user_cache.invalidate(user.id)
         
         # Log user in
         login_user(user, remember=data.get('remember_me', True))
@@ -163,6 +171,7 @@ def update_profile():
                 setattr(current_user, field, data[field])
         
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -199,6 +208,7 @@ def change_password():
         # Update password
         current_user.set_password(new_password)
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
@@ -223,6 +233,7 @@ def deactivate_account():
         
         current_user.is_active = False
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         
         logout_user()
         
@@ -255,9 +266,10 @@ def delete_account():
         # Logout first to clear session
         logout_user()
         
-        # Delete user (cascades to all related data via model relationships)
-        db.session.delete(user_to_delete)
-        db.session.commit()
+        # Delete the user and their logs (on the user's shard when sharding)
+        user_id = user_to_delete.id
+        user_to_delete.delete_account()
+        user_cache.invalidate(user_id)
         
         return jsonify({'message': 'Account deleted successfully'}), 200
         
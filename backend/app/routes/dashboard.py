@@ -0,0 +1,116 @@
+from datetime import date
+from flask import Blueprint, jsonify, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import func, case
+from app.models import FeedingLog, MedicationLog, DailyFeedingTracker
+from app import db, cache, limiter
+from app.routes.tracker import get_or_create_today_tracker
+from app.utils.tracker_cache import tracker_cache_key, cache_tracker
+from app.utils.dashboard_cache import dashboard_cache_key, SECTION_TIMEOUTS
+from app.utils.serialization import serialize_rows
+from app.utils.sql_profiler import query_budget
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+RECENT_LIMIT = 10
+STATS_DAYS = 30
+
+def get_recent_feedings(user_id):
+    logs = FeedingLog.query.filter_by(user_id=user_id)\
+        .order_by(FeedingLog.time_given.desc())\
+        .limit(RECENT_LIMIT).all()
+    return serialize_rows(logs)
+
+def get_recent_medications(user_id):
+    logs = MedicationLog.query.filter_by(user_id=user_id)\
+        .order_by(MedicationLog.time_given.desc())\
+        .limit(RECENT_LIMIT).all()
+    return serialize_rows(logs)
+
+def get_user_tracker_stats(user_id):
+    """Tracker statistics over the user's last 30 days, in a single aggregate query"""
+    recent = db.session.query(
+        DailyFeedingTracker.total_fed_ml,
+        DailyFeedingTracker.daily_target_ml,
+        DailyFeedingTracker.feeding_count
+    ).filter(
+        DailyFeedingTracker.user_id == user_id,
+        # Skip tomorrow's tracker, precreated shortly before midnight
+        DailyFeedingTracker.target_date <= date.today()
+    ).order_by(
+        DailyFeedingTracker.target_date.desc()
+    ).limit(STATS_DAYS).subquery()
+
+    total_days, completed_days, total_intake, total_feedings = db.session.query(
+        func.count(),
+        func.coalesce(func.sum(case((recent.c.total_fed_ml >= recent.c.daily_target_ml, 1), else_=0)), 0),
+        func.coalesce(func.sum(recent.c.total_fed_ml), 0.0),
+        func.coalesce(func.sum(recent.c.feeding_count), 0)
+    ).one()
+
+    if not total_days:
+        return {
+            "total_days": 0,
+            "completed_days": 0,
+            "completion_rate": 0,
+            "average_daily_intake": 0,
+            "average_feedings_per_day": 0
+        }
+
+    return {
+        "total_days": total_days,
+        "completed_days": completed_days,
+        "completion_rate": round((completed_days / total_days) * 100, 1),
+        "average_daily_intake": round(total_intake / total_days, 1),
+        "average_feedings_per_day": round(total_feedings / total_days, 1)
+    }
+
+SECTION_LOADERS = {
+    'feedings': get_recent_feedings,
+    'medications': get_recent_medications,
+    'stats': get_user_tracker_stats,
+}
+
+@dashboard_bp.route('/', methods=['GET'])
+@login_required
+@limiter.limit("200 per minute")
+@query_budget(10)
+def get_dashboard():
+    """Everything the dashboard needs on page load, in one response"""
+    try:
+        user_id = current_user.id
+        sections = list(SECTION_LOADERS)
+        keys = [tracker_cache_key(user_id)] + [dashboard_cache_key(s, user_id) for s in sections]
+
+        # One cache round trip for every section
+        try:
+            cached = cache.get_many(*keys)
+        except Exception as e:
+            current_app.logger.warning(f"Dashboard cache read failed: {str(e)}")
+            cached = [None] * len(keys)
+
+        tracker = cached[0]
+        if tracker is None:
+            tracker_obj = get_or_create_today_tracker(user_id)
+            cache_tracker(tracker_obj)
+            tracker = tracker_obj.to_dict()
+
+        payload = {'user': current_user.to_dict(), 'tracker': tracker}
+        misses = {}
+        for section, value in zip(sections, cached[1:]):
+            if value is None:
+                value = SECTION_LOADERS[section](user_id)
+                misses[section] = value
+            payload[section] = value
+
+        for section, value in misses.items():
+            try:
+                cache.set(dashboard_cache_key(section, user_id), value, timeout=SECTION_TIMEOUTS[section])
+            except Exception as e:
+                current_app.logger.warning(f"Dashboard cache write failed: {str(e)}")
+
+        return jsonify(payload), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to load dashboard'}), 500
@@ -2,11 +2,15 @@ from datetime import date
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app.models import FeedingLog, DailyFeedingTracker
-from app import db, cache, limiter
+from app import db, limiter
+from app.utils.tracker_cache import invalidate_tracker
+from app.utils.dashboard_cache import invalidate_dashboard
+from app.utils.serialization import serialize_rows
+from app.utils.sql_profiler import query_budget
 
 feeding_bp = Blueprint('feeding', __name__)
 
-def get_or_create_today_tracker(user_id):
+def get_or_create_today_tracker(user_id, daily_target=None):
     """Get or create today's feeding tracker for a specific user"""
     today = date.today()
     tracker = DailyFeedingTracker.query.filter_by(
@@ -15,10 +19,11 @@ def get_or_create_today_tracker(user_id):
     ).first()
     
     if not tracker:
-        # Get user's default daily target
-        from app.models import User
-        user = User.query.get(user_id)
-        daily_target = user.daily_target_ml if user else 210.0
+        # Get user's default daily target (callers with current_user pass it in)
+        if daily_target is None:
+            from app.models import User
+            user = User.query.get(user_id)
+            daily_target = user.daily_target_ml if user else 210.0
         
         tracker = DailyFeedingTracker(
             user_id=user_id,
@@ -35,6 +40,7 @@ def get_or_create_today_tracker(user_id):
 @feeding_bp.route('/', methods=['POST'])
 @login_required
 @limiter.limit("60 per minute")
+@query_budget(8)
 def create_feeding():
     """Log feeding for authenticated user"""
     try:
@@ -58,15 +64,16 @@ def create_feeding():
         db.session.add(log)
         
         # Update daily tracker
-        tracker = get_or_create_today_tracker(current_user.id)
+        tracker = get_or_create_today_tracker(current_user.id, current_user.daily_target_ml)
         tracker.add_feeding(amount_ml)
         
-        # Clear cache for this user's tracker
-        cache.delete(f'tracker_today_{current_user.id}')
-        
         # Commit both the feeding log and tracker update
         db.session.commit()
         
+        # Clear cache for this user's tracker and dashboard
+        invalidate_tracker(current_user.id)
+        invalidate_dashboard(current_user.id, 'feedings', 'stats')
+        
         return jsonify({
             "message": "Feeding logged successfully",
             "data": {
@@ -108,7 +115,7 @@ def get_feedings():
             )
         
         return jsonify({
-            'logs': [log.to_dict() for log in logs.items],
+            'logs': serialize_rows(logs.items),
             'pagination': {
                 'page': page,
                 'pages': logs.pages,
@@ -1,7 +1,11 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app.models import MedicationLog
 from app import db, limiter
+from app.utils.dashboard_cache import invalidate_dashboard
+from app.utils.serialization import serialize_rows
+from app.utils.sharding import shard_router
 
 medlog_bp = Blueprint('medication_log', __name__)
 
@@ -38,6 +42,7 @@ def create_medlog():
         )
         db.session.add(log)
         db.session.commit()
+        invalidate_dashboard(current_user.id, 'medications')
 
         return jsonify({
             "message": "Medication logged successfully",
@@ -50,5 +55,8 @@ def create_medlog():
 
 @medlog_bp.route('/', methods=['GET'])
 def get_medlogs():
-    logs = MedicationLog.query.order_by(MedicationLog.time_given.desc()).all()
-    return jsonify([log.to_dict() for log in logs])
\ No newline at end of file
+    logs = shard_router.query_all(
+        MedicationLog.query.order_by(MedicationLog.time_given.desc()),
+        key=lambda log: log.time_given or datetime.min, reverse=True
+    )
+    return jsonify(serialize_rows(logs))
\ No newline at end of file
@@ -1,67 +1,52 @@
-import asyncio
 import uuid
 from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file
-from app.utils.export import report_generator
+from app.utils.export import (
+    set_report_status, get_report_status as load_report_status, get_report_result,
+    discard_report, list_active_reports
+)
 import io
-import threading
 
 report_bp = Blueprint('report', __name__)
 
-# Store for async tasks
-async_tasks = {}
+def queue_report(report_type):
+    """Validate the request and queue a report on the Celery reports queue"""
+    from app.tasks import generate_report
 
-def run_async_report(report_id, coro):
-    """Run async coroutine in thread"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        result = loop.run_until_complete(coro)
-        async_tasks[report_id] = {'status': 'completed', 'result': result}
-    except Exception as e:
-        async_tasks[report_id] = {'status': 'error', 'error': str(e)}
-    finally:
-        loop.close()
+    data = request.get_json() or {}
+    
+    # Parse parameters (passed to the task as ISO strings)
+    start_date = None
+    end_date = None
+    if data.get('start_date'):
+        start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00')).isoformat()
+    if data.get('end_date'):
+        end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00')).isoformat()
+        
+    format_type = data.get('format', 'csv').lower()
+    if format_type not in ['csv', 'json', 'excel']:
+        return jsonify({'error': 'Invalid format. Use csv, json, or excel'}), 400
+        
+    # Generate unique report ID (also the Celery task id)
+    report_id = str(uuid.uuid4())
+    set_report_status(report_id, 'queued', progress=0)
+    generate_report.apply_async(
+        args=[report_id, report_type],
+        kwargs={'start_date': start_date, 'end_date': end_date, 'format': format_type},
+        task_id=report_id
+    )
+    
+    return jsonify({
+        'report_id': report_id,
+        'status': 'processing',
+        'message': 'Report generation started'
+    }), 202
 
 @report_bp.route('/feeding', methods=['POST'])
 def generate_feeding_report():
     """Start async feeding report generation"""
     try:
-        data = request.get_json() or {}
-        
-        # Parse parameters
-        start_date = None
-        end_date = None
-        if data.get('start_date'):
-            start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        if data.get('end_date'):
-            end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-            
-        format_type = data.get('format', 'csv').lower()
-        if format_type not in ['csv', 'json', 'excel']:
-            return jsonify({'error': 'Invalid format. Use csv, json, or excel'}), 400
-            
-        # Generate unique report ID
-        report_id = str(uuid.uuid4())
-        
-        # Start async task
-        coro = report_generator.generate_feeding_report(
-            start_date=start_date,
-            end_date=end_date,
-            format=format_type,
-            report_id=report_id
-        )
-        
-        thread = threading.Thread(target=run_async_report, args=(report_id, coro))
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({
-            'report_id': report_id,
-            'status': 'processing',
-            'message': 'Report generation started'
-        }), 202
-        
+        return queue_report('feeding')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,38 +54,7 @@ def generate_feeding_report():
 def generate_medication_report():
     """Start async medication report generation"""
     try:
-        data = request.get_json() or {}
-        
-        start_date = None
-        end_date = None
-        if data.get('start_date'):
-            start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        if data.get('end_date'):
-            end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-            
-        format_type = data.get('format', 'csv').lower()
-        if format_type not in ['csv', 'json', 'excel']:
-            return jsonify({'error': 'Invalid format. Use csv, json, or excel'}), 400
-            
-        report_id = str(uuid.uuid4())
-        
-        coro = report_generator.generate_medication_report(
-            start_date=start_date,
-            end_date=end_date,
-            format=format_type,
-            report_id=report_id
-        )
-        
-        thread = threading.Thread(target=run_async_report, args=(report_id, coro))
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({
-            'report_id': report_id,
-            'status': 'processing',
-            'message': 'Report generation started'
-        }), 202
-        
+        return queue_report('medication')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,38 +62,7 @@ def generate_medication_report():
 def generate_combined_report():
     """Start async combined report generation"""
     try:
-        data = request.get_json() or {}
-        
-        start_date = None
-        end_date = None
-        if data.get('start_date'):
-            start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        if data.get('end_date'):
-            end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-            
-        format_type = data.get('format', 'csv').lower()
-        if format_type not in ['csv', 'json', 'excel']:
-            return jsonify({'error': 'Invalid format. Use csv, json, or excel'}), 400
-            
-        report_id = str(uuid.uuid4())
-        
-        coro = report_generator.generate_combined_report(
-            start_date=start_date,
-            end_date=end_date,
-            format=format_type,
-            report_id=report_id
-        )
-        
-        thread = threading.Thread(target=run_async_report, args=(report_id, coro))
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({
-            'report_id': report_id,
-            'status': 'processing',
-            'message': 'Report generation started'
-        }), 202
-        
+        return queue_report('combined')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -147,26 +70,22 @@ def generate_combined_report():
 def get_report_status(report_id):
     """Get status of async report generation"""
     try:
-        # Check async task status
-        if report_id in async_tasks:
-            task_status = async_tasks[report_id]
-            if task_status['status'] == 'completed':
-                return jsonify({
-                    'status': 'completed',
-                    'ready_for_download': True
-                })
-            elif task_status['status'] == 'error':
-                return jsonify({
-                    'status': 'error',
-                    'error': task_status['error']
-                }), 500
-                
-        # Check progress from report generator
-        progress = report_generator.get_progress(report_id)
-        if progress['status'] == 'not_found':
+        status = load_report_status(report_id)
+        if status is None:
             return jsonify({'error': 'Report not found'}), 404
             
-        return jsonify(progress)
+        if status['status'] == 'completed':
+            return jsonify({
+                'status': 'completed',
+                'ready_for_download': True
+            })
+        elif status['status'] == 'error':
+            return jsonify({
+                'status': 'error',
+                'error': status.get('error')
+            }), 500
+            
+        return jsonify(status)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -175,14 +94,14 @@ def get_report_status(report_id):
 def download_report(report_id):
     """Download completed report"""
     try:
-        if report_id not in async_tasks:
+        status = load_report_status(report_id)
+        if status is None:
             return jsonify({'error': 'Report not found'}), 404
             
-        task = async_tasks[report_id]
-        if task['status'] != 'completed':
+        result = get_report_result(report_id)
+        if status['status'] != 'completed' or result is None:
             return jsonify({'error': 'Report not ready for download'}), 400
             
-        result = task['result']
         report_data = result['data']
         report_format = result['format']
         report_type = result['type']
@@ -191,12 +110,12 @@ def download_report(report_id):
         if report_format == 'csv':
             mimetype = 'text/csv'
             filename = f"{report_type}_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            file_obj = io.StringIO(report_data)
+            file_obj = io.BytesIO(report_data.encode('utf-8'))
             
         elif report_format == 'json':
             mimetype = 'application/json'
             filename = f"{report_type}_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            file_obj = io.StringIO(report_data)
+            file_obj = io.BytesIO(report_data.encode('utf-8'))
             
         elif report_format == 'excel':
             mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -206,9 +125,8 @@ def download_report(report_id):
         else:
             return jsonify({'error': 'Unsupported format'}), 400
             
-        # Cleanup task after successful download initiation
-        del async_tasks[report_id]
-        report_generator.cleanup_progress(report_id)
+        # Cleanup report after successful download initiation
+        discard_report(report_id)
         
         # Send file
         file_obj.seek(0)
@@ -226,9 +144,7 @@ def download_report(report_id):
 def cleanup_report(report_id):
     """Cleanup report data"""
     try:
-        if report_id in async_tasks:
-            del async_tasks[report_id]
-        report_generator.cleanup_progress(report_id)
+        discard_report(report_id)
         
         return jsonify({'message': 'Report data cleaned up'})
         
@@ -239,16 +155,8 @@ def cleanup_report(report_id):
 def get_active_reports():
     """Get list of active reports"""
     try:
-        active_reports = []
+        active_reports = list_active_reports()
         
-        for report_id, task in async_tasks.items():
-            progress = report_generator.get_progress(report_id)
-            active_reports.append({
-                'report_id': report_id,
-                'status': task.get('status', progress.get('status', 'unknown')),
-                'progress': progress.get('progress', 0)
-            })
-            
         return jsonify({'active_reports': active_reports})
         
     except Exception as e:
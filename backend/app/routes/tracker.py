@@ -1,8 +1,13 @@
 from datetime import date, datetime
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from app.models import DailyFeedingTracker
 from app import db
+from app.utils.tracker_cache import get_cached_tracker, cache_tracker, invalidate_tracker
+from app.utils.dashboard_cache import invalidate_dashboard
+from app.utils.serialization import serialize_rows
+from app.utils.sharding import shard_router
 
 tracker_bp = Blueprint('tracker', __name__)
 
@@ -16,7 +21,12 @@ def get_or_create_today_tracker(user_id, daily_target=210.0):
     if not tracker:
         tracker = DailyFeedingTracker(user_id=user_id, daily_target_ml=daily_target, target_date=today)
         db.session.add(tracker)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request created it first (unique_user_date); use theirs
+            db.session.rollback()
+            tracker = DailyFeedingTracker.query.filter_by(user_id=user_id, target_date=today).first()
         # print(f"Created new tracker for user {user_id} on {today} with target {daily_target}mL")
     elif tracker.is_overdue():
         # Reset if somehow we have an old tracker
@@ -33,7 +43,12 @@ def get_or_create_today_tracker(user_id, daily_target=210.0):
 def get_today_tracker():
     """Get today's feeding tracker for authenticated user"""
     try:
+        cached = get_cached_tracker(current_user.id)
+        if cached:
+            return jsonify(cached)
+
         tracker = get_or_create_today_tracker(current_user.id)
+        cache_tracker(tracker)
         return jsonify(tracker.to_dict())
     except Exception as e:
         return jsonify({"error": "Failed to get tracker"}), 500
@@ -74,6 +89,8 @@ def create_or_update_today_tracker():
             message = f"Created new tracker with {daily_target}mL daily target"
             
         db.session.commit()
+        invalidate_tracker(current_user.id)
+        invalidate_dashboard(current_user.id, 'stats')
         
         return jsonify({
             "message": message,
@@ -140,6 +157,8 @@ def reset_tracker():
         tracker.reset_for_new_day(new_daily_target)
         
         db.session.commit()
+        invalidate_tracker(current_user.id)
+        invalidate_dashboard(current_user.id, 'feedings', 'stats')
         
         return jsonify({
             "message": f"Deleted {deleted_count} feeding records and reset tracker successfully",
@@ -158,14 +177,16 @@ def get_tracker_history():
     try:
         days = request.args.get('days', 7, type=int)
         
-        trackers = DailyFeedingTracker.query.filter_by(
-            user_id=current_user.id
+        # Tomorrow's tracker is precreated shortly before midnight; leave it out until then
+        trackers = DailyFeedingTracker.query.filter(
+            DailyFeedingTracker.user_id == current_user.id,
+            DailyFeedingTracker.target_date <= date.today()
         ).order_by(
             DailyFeedingTracker.target_date.desc()
         ).limit(days).all()
         
         return jsonify({
-            "trackers": [tracker.to_dict() for tracker in trackers],
+            "trackers": serialize_rows(trackers),
             "total_count": len(trackers)
         })
         
@@ -177,9 +198,11 @@ def get_tracker_stats():
     """Get tracker statistics"""
     try:
         # Get recent trackers for stats
-        recent_trackers = DailyFeedingTracker.query.order_by(
-            DailyFeedingTracker.target_date.desc()
-        ).limit(30).all()
+        recent_trackers = shard_router.query_all(
+            DailyFeedingTracker.query.filter(DailyFeedingTracker.target_date <= date.today())
+            .order_by(DailyFeedingTracker.target_date.desc()).limit(30),
+            key=lambda t: t.target_date, reverse=True, limit=30
+        )
         
         if not recent_trackers:
             return jsonify({
@@ -219,15 +242,17 @@ def cleanup_old_trackers():
         days_to_keep = request.args.get('days', 30, type=int)
         cutoff_date = date.today() - datetime.timedelta(days=days_to_keep)
         
-        old_trackers = DailyFeedingTracker.query.filter(
-            DailyFeedingTracker.target_date < cutoff_date
-        ).all()
-        
-        count = len(old_trackers)
-        for tracker in old_trackers:
-            db.session.delete(tracker)
+        count = 0
+        for _ in shard_router.each_shard():
+            old_trackers = DailyFeedingTracker.query.filter(
+                DailyFeedingTracker.target_date < cutoff_date
+            ).all()
             
-        db.session.commit()
+            count += len(old_trackers)
+            for tracker in old_trackers:
+                db.session.delete(tracker)
+                
+            db.session.commit()
         
         # print(f"Cleaned up {count} old trackers")
         
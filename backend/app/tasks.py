@@ -0,0 +1,75 @@
+"""Celery tasks: report exports and scheduled maintenance.
+
+Routing to the ``reports`` and ``maintenance`` queues is set in
+app/celery_app.py; each task runs inside the Flask app context.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from celery import shared_task
+from flask import current_app
+from app.utils.export import report_generator, set_report_status, store_report_result
+from app.utils.metrics import report_started, report_finished
+from app.utils import schedule
+from app.utils.db_routing import read_from_replica
+from app.utils.jobs import Job
+
+REPORT_GENERATORS = {
+    'feeding': report_generator.generate_feeding_report,
+    'medication': report_generator.generate_medication_report,
+    'combined': report_generator.generate_combined_report,
+}
+
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+@shared_task(name='app.tasks.generate_report', rate_limit='30/m', soft_time_limit=600, time_limit=660)
+def generate_report(report_id, report_type, start_date=None, end_date=None, format='csv'):
+    """Build a report and store it for download under its report id"""
+    set_report_status(report_id, 'processing', progress=0)
+    report_started()
+    try:
+        # Report queries are heavy and read-only; keep them off the primary
+        with read_from_replica():
+            result = asyncio.run(REPORT_GENERATORS[report_type](
+                start_date=_parse_date(start_date),
+                end_date=_parse_date(end_date),
+                format=format,
+                report_id=report_id
+            ))
+    except Exception as e:
+        current_app.logger.exception(f"Report {report_id} failed")
+        set_report_status(report_id, 'error', error=str(e))
+        return
+    finally:
+        report_finished()
+        report_generator.cleanup_progress(report_id)
+
+    store_report_result(report_id, result)
+    set_report_status(report_id, 'completed', progress=100)
+
+def _run_job(name, func, *args):
+    """Run a scheduled job's work and report the outcome back to the scheduler leader"""
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception as e:
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        schedule.report_job_result(name, 'error', duration_ms, error=str(e))
+        raise
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    schedule.report_job_result(name, 'ok', duration_ms, rows=Job.count_rows(result))
+    return result
+
+@shared_task(name='app.tasks.cleanup_old_trackers', time_limit=900)
+def cleanup_old_trackers(days_to_keep=30):
+    return _run_job('cleanup_old_trackers', schedule.cleanup_old_trackers, days_to_keep)
+
+@shared_task(name='app.tasks.cleanup_inactive_users', time_limit=1800)
+def cleanup_inactive_users():
+    return _run_job('cleanup_inactive_users', schedule.cleanup_inactive_users)
+
+@shared_task(name='app.tasks.precreate_trackers', time_limit=900)
+def precreate_trackers():
+    return _run_job('precreate_trackers', schedule.precreate_tomorrow_trackers)
@@ -0,0 +1,172 @@
+import threading
+import time
+from datetime import datetime
+from flask import g
+import redis
+from sqlalchemy import update, values, column, or_, DateTime
+from app import db
+from app.utils.redis_client import get_redis_client
+
+LAST_LOGIN_KEY = 'catetube:activity:last_login'
+LAST_SEEN_KEY = 'catetube:activity:last_seen'
+
+# HSET only if the new timestamp is newer than what's buffered
+RECORD_SCRIPT = """
+local current = redis.call('hget', KEYS[1], ARGV[1])
+if not current or tonumber(current) < tonumber(ARGV[2]) then
+    redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+# Read and clear the buffer atomically so concurrent flushers never double-apply
+DRAIN_SCRIPT = """
+local data = redis.call('hgetall', KEYS[1])
+redis.call('del', KEYS[1])
+return data
+"""
+
+class ActivityRecorder:
+    """Write-behind buffer for User.last_login and User.last_seen.
+
+    Requests only record a timestamp in Redis (or in this process's memory when
+    Redis is unavailable); a background thread periodically drains the buffer
+    into the user table with bulk UPDATEs.
+    """
+
+    def __init__(self, flush_interval=60, seen_throttle=300, batch_size=1000):
+        self.flush_interval = flush_interval
+        self.seen_throttle = seen_throttle
+        self.batch_size = batch_size
+        self.app = None
+        self._local = {LAST_LOGIN_KEY: {}, LAST_SEEN_KEY: {}}
+        self._recently_seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('ACTIVITY_FLUSH_INTERVAL', self.flush_interval)
+        self.seen_throttle = app.config.get('ACTIVITY_SEEN_THROTTLE', self.seen_throttle)
+
+        @app.after_request
+        def record_request_activity(response):
+            # Only look at users Flask-Login already loaded; don't force a load
+            user = g.get('_login_user')
+            if user is not None and user.is_authenticated:
+                self.record_seen(user.id)
+            return response
+
+        if not app.config.get('TESTING'):
+            from app.utils.worker_boot import worker_boot
+            worker_boot.start_in_worker(self.start)
+
+    def record_login(self, user_id):
+        """Buffer a login (also counts as activity)"""
+        ts = time.time()
+        self._record(LAST_LOGIN_KEY, user_id, ts)
+        self._record(LAST_SEEN_KEY, user_id, ts)
+
+    def record_seen(self, user_id):
+        """Buffer activity, at most once per throttle window per user in this process"""
+        now = time.monotonic()
+        last = self._recently_seen.get(user_id)
+        if last is not None and now - last < self.seen_throttle:
+            return
+        self._recently_seen[user_id] = now
+        if len(self._recently_seen) > 50000:
+            self._recently_seen.clear()
+        self._record(LAST_SEEN_KEY, user_id, time.time())
+
+    def _record(self, key, user_id, ts):
+        try:
+            get_redis_client().eval(RECORD_SCRIPT, 1, key, str(user_id), repr(ts))
+        except redis.RedisError:
+            with self._lock:
+                buffer = self._local[key]
+                buffer[str(user_id)] = max(ts, buffer.get(str(user_id), 0))
+
+    def _drain(self, key):
+        """Collect buffered timestamps from Redis and this process"""
+        with self._lock:
+            pending = self._local[key]
+            self._local[key] = {}
+        try:
+            raw = get_redis_client().eval(DRAIN_SCRIPT, 1, key)
+            for user_id, ts in zip(raw[::2], raw[1::2]):
+                user_id, ts = user_id.decode(), float(ts)
+                pending[user_id] = max(ts, pending.get(user_id, 0))
+        except redis.RedisError:
+            pass
+        return pending
+
+    def flush(self):
+        """Write buffered timestamps to the user table; returns rows updated"""
+        from app.models import User
+
+        updated = 0
+        for key, target in ((LAST_LOGIN_KEY, User.last_login), (LAST_SEEN_KEY, User.last_seen)):
+            pending = self._drain(key)
+            items = [(user_id, datetime.utcfromtimestamp(ts)) for user_id, ts in pending.items()]
+            for start in range(0, len(items), self.batch_size):
+                try:
+                    updated += self._bulk_update(User, target, items[start:start + self.batch_size])
+                except Exception:
+                    # Put the unwritten timestamps back so the next flush retries them
+                    db.session.rollback()
+                    with self._lock:
+                        buffer = self._local[key]
+                        for user_id, _ in items[start:]:
+                            buffer[user_id] = max(pending[user_id], buffer.get(user_id, 0))
+                    raise
+        return updated
+
+    @staticmethod
+    def _bulk_update(User, target, items):
+        if not items:
+            return 0
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # UPDATE "user" SET col = v.ts FROM (VALUES ...) AS v(id, ts)
+            # WHERE "user".id = v.id AND (col IS NULL OR col < v.ts)
+            rows = values(
+                column('id', User.id.type),
+                column('ts', DateTime),
+                name='v'
+            ).data(items)
+            stmt = update(User).where(
+                User.id == rows.c.id,
+                or_(target.is_(None), target < rows.c.ts)
+            ).values({target: rows.c.ts})
+            result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+            db.session.commit()
+            return result.rowcount
+
+        # Other backends: one executemany UPDATE by primary key
+        db.session.execute(update(User), [{'id': user_id, target.key: ts} for user_id, ts in items])
+        db.session.commit()
+        return len(items)
+
+    def reset_after_fork(self):
+        """Drop state copied from the parent process (see worker_boot)"""
+        self._lock = threading.Lock()
+        self._local = {LAST_LOGIN_KEY: {}, LAST_SEEN_KEY: {}}
+        self._recently_seen = {}
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                self.app.logger.error(f"Error flushing activity timestamps: {str(e)}")
+
+# Global instance
+activity_recorder = ActivityRecorder()
@@ -0,0 +1,372 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import redis
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.rediscache import RedisCache
+from app.utils.metrics import record_cache
+from app.utils.tracing import tracer
+
+INVALIDATION_CHANNEL = 'catetube:cache:invalidate'
+
+class TieredCache(BaseCache):
+    """Two-level cache: a bounded per-process LRU (L1) in front of Redis (L2).
+
+    Reads are served from L1 when possible, so hot keys cost no network round
+    trip. Writes and deletes go to both levels and are broadcast over Redis
+    pub/sub so other workers drop their stale L1 copies. If Redis errors, the
+    cache keeps working from L1 alone and retries Redis after a cool-down.
+
+    Keys are namespaced by their prefix before the first ``:`` (``user:...``,
+    ``tracker:...``); a namespace can have its own default timeout. Values held
+    in L1 are shared between callers, so treat cached values as read-only.
+
+    While Redis is down, deletes can't reach other workers, so L1 keeps entries
+    for their full timeout only outside ``strict_namespaces``. Stale sessions
+    (``user:``) would keep deactivated or deleted users logged in.
+    """
+
+    def __init__(self, redis_url, default_timeout=300, key_prefix='flask_cache_',
+                 l1_max_entries=5000, l1_ttl=30, namespace_timeouts=None,
+                 retry_after=30, socket_timeout=0.25, strict_namespaces=('user',)):
+        super().__init__(default_timeout=default_timeout)
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.l1_max_entries = l1_max_entries
+        self.l1_ttl = l1_ttl
+        self.namespace_timeouts = namespace_timeouts or {}
+        self.retry_after = retry_after
+        self.socket_timeout = socket_timeout
+        self.strict_namespaces = frozenset(strict_namespaces)
+
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._l2 = None
+        self._l2_pid = None
+        self._l2_down_until = 0
+        self._listener_pid = None
+        self._origin = None
+        self.stats = {}
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            redis_url=config['CACHE_REDIS_URL'],
+            key_prefix=config.get('CACHE_KEY_PREFIX') or 'flask_cache_',
+            l1_max_entries=config.get('CACHE_L1_MAX_ENTRIES', 5000),
+            l1_ttl=config.get('CACHE_L1_TTL', 30),
+            namespace_timeouts=config.get('CACHE_NAMESPACE_TIMEOUTS'),
+            retry_after=config.get('CACHE_REDIS_RETRY_AFTER', 30),
+            socket_timeout=config.get('CACHE_REDIS_SOCKET_TIMEOUT', 0.25)
+        )
+        return cls(*args, **kwargs)
+
+    # -- helpers ---------------------------------------------------------
+
+    @staticmethod
+    def namespace(key):
+        return key.split(':', 1)[0] if ':' in key else 'default'
+
+    def _count(self, key, outcome):
+        counters = self.stats.setdefault(self.namespace(key), {'l1_hits': 0, 'l2_hits': 0, 'misses': 0})
+        counters[outcome] += 1
+        record_cache(self.namespace(key), outcome)
+        tracer.annotate('cache.result', outcome)
+
+    def _timeout_for(self, key, timeout):
+        if timeout is None:
+            timeout = self.namespace_timeouts.get(self.namespace(key), self.default_timeout)
+        return timeout
+
+    def _redis(self):
+        """The L2 backend, or None while Redis is marked down"""
+        if time.monotonic() < self._l2_down_until:
+            return None
+        # Connections don't survive fork, so each worker builds its own client
+        if self._l2 is None or self._l2_pid != os.getpid():
+            client = redis.Redis.from_url(
+                self.redis_url,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.socket_timeout
+            )
+            self._l2 = RedisCache(host=client, default_timeout=self.default_timeout, key_prefix=self.key_prefix)
+            self._l2_pid = os.getpid()
+            self._origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._ensure_listener()
+        return self._l2
+
+    def _l2_failed(self, error):
+        self._l2_down_until = time.monotonic() + self.retry_after
+        try:
+            from flask import current_app
+            current_app.logger.warning(f"Redis cache unavailable, using local cache only: {error}")
+        except RuntimeError:
+            pass
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry
+
+    def _l1_set(self, key, value, timeout):
+        ttl = self.l1_ttl if not timeout else min(self.l1_ttl, timeout)
+        # While Redis is down L1 is all we have, so keep entries for their full timeout
+        if time.monotonic() < self._l2_down_until and timeout and self.namespace(key) not in self.strict_namespaces:
+            ttl = timeout
+        with self._lock:
+            self._l1[key] = (time.monotonic() + ttl, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    # -- cross-worker invalidation ---------------------------------------
+
+    def _publish(self, l2, keys):
+        try:
+            payload = '*' if keys is None else '\n'.join(keys)
+            l2._write_client.publish(INVALIDATION_CHANNEL, f"{self._origin}|{payload}")
+        except redis.RedisError as e:
+            self._l2_failed(e)
+
+    def _ensure_listener(self):
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name='cache-invalidation', daemon=True).start()
+
+    def _listen(self):
+        """Drop L1 entries other workers have changed"""
+        while True:
+            try:
+                # No read timeout here: the subscriber blocks until a message arrives
+                client = redis.Redis.from_url(self.redis_url, health_check_interval=30)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    origin, _, payload = message['data'].decode().partition('|')
+                    if origin == self._origin:
+                        continue
+                    if payload == '*':
+                        with self._lock:
+                            self._l1.clear()
+                    else:
+                        self._l1_delete(*payload.split('\n'))
+            except Exception:
+                # Missed invalidations are bounded by the short L1 TTL
+                with self._lock:
+                    self._l1.clear()
+                time.sleep(self.retry_after)
+
+    # -- worker lifecycle ------------------------------------------------
+
+    def reset_after_fork(self):
+        """Start a forked worker with an empty L1 and no Redis client or listener"""
+        self._lock = threading.Lock()
+        self._l1 = OrderedDict()
+        self._l2 = None
+        self._l2_pid = None
+        self._listener_pid = None
+        self.stats = {}
+
+    def ping(self):
+        """Connect to Redis (and start the invalidation listener) ahead of the first request"""
+        l2 = self._redis()
+        if l2 is None:
+            return False
+        try:
+            return bool(l2._read_client.ping())
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return False
+
+    # -- cache API -------------------------------------------------------
+
+    def get(self, key):
+        with tracer.span('cache.get', **{'cache.key': key}):
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self._l1_get(key)
+        if entry is not None:
+            self._count(key, 'l1_hits')
+            return entry[1]
+
+        l2 = self._redis()
+        if l2 is not None:
+            try:
+                value = l2.get(key)
+            except redis.RedisError as e:
+                self._l2_failed(e)
+                value = None
+            if value is not None:
+                self._count(key, 'l2_hits')
+                self._l1_set(key, value, self.l1_ttl)
+                return value
+
+        self._count(key, 'misses')
+        return None
+
+    def get_many(self, *keys):
+        with tracer.span('cache.get_many', **{'cache.keys': len(keys)}):
+            return self._get_many(*keys)
+
+    def _get_many(self, *keys):
+        results = {}
+        missing = []
+        for key in keys:
+            entry = self._l1_get(key)
+            if entry is not None:
+                self._count(key, 'l1_hits')
+                results[key] = entry[1]
+            else:
+                missing.append(key)
+
+        l2 = self._redis() if missing else None
+        if l2 is not None:
+            try:
+                for key, value in zip(missing, l2.get_many(*missing)):
+                    if value is not None:
+                        self._count(key, 'l2_hits')
+                        self._l1_set(key, value, self.l1_ttl)
+                        results[key] = value
+            except redis.RedisError as e:
+                self._l2_failed(e)
+
+        for key in missing:
+            if key not in results:
+                self._count(key, 'misses')
+        return [results.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        with tracer.span('cache.set', **{'cache.key': key}):
+            return self._set(key, value, timeout)
+
+    def _set(self, key, value, timeout=None):
+        timeout = self._timeout_for(key, timeout)
+        self._l1_set(key, value, timeout)
+        l2 = self._redis()
+        if l2 is not None:
+            try:
+                l2.set(key, value, timeout=timeout)
+                self._publish(l2, [key])
+            except redis.RedisError as e:
+                self._l2_failed(e)
+        return True
+
+    def set_many(self, mapping, timeout=None):
+        with tracer.span('cache.set_many', **{'cache.keys': len(mapping)}):
+            return self._set_many(mapping, timeout)
+
+    def _set_many(self, mapping, timeout=None):
+        for key, value in mapping.items():
+            self._l1_set(key, value, self._timeout_for(key, timeout))
+        l2 = self._redis()
+        if l2 is not None:
+            try:
+                by_timeout = {}
+                for key, value in mapping.items():
+                    by_timeout.setdefault(self._timeout_for(key, timeout), {})[key] = value
+                for ns_timeout, items in by_timeout.items():
+                    l2.set_many(items, timeout=ns_timeout)
+                self._publish(l2, list(mapping))
+            except redis.RedisError as e:
+                self._l2_failed(e)
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        timeout = self._timeout_for(key, timeout)
+        l2 = self._redis()
+        if l2 is None:
+            if self._l1_get(key) is not None:
+                return False
+            self._l1_set(key, value, timeout)
+            return True
+        try:
+            added = l2.add(key, value, timeout=timeout)
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return self.add(key, value, timeout)
+        if added:
+            self._l1_set(key, value, timeout)
+        return added
+
+    def delete(self, key):
+        return self.delete_many(key) == [key]
+
+    def delete_many(self, *keys):
+        with tracer.span('cache.delete_many', **{'cache.keys': len(keys)}):
+            return self._delete_many(*keys)
+
+    def _delete_many(self, *keys):
+        self._l1_delete(*keys)
+        l2 = self._redis()
+        if l2 is not None and keys:
+            try:
+                l2.delete_many(*keys)
+                self._publish(l2, list(keys))
+            except redis.RedisError as e:
+                self._l2_failed(e)
+        return list(keys)
+
+    def has(self, key):
+        if self._l1_get(key) is not None:
+            return True
+        l2 = self._redis()
+        if l2 is None:
+            return False
+        try:
+            return l2.has(key)
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        l2 = self._redis()
+        if l2 is not None:
+            try:
+                l2.clear()
+                self._publish(l2, None)
+            except redis.RedisError as e:
+                self._l2_failed(e)
+        return True
+
+    def inc(self, key, delta=1):
+        self._l1_delete(key)
+        l2 = self._redis()
+        if l2 is None:
+            return None
+        try:
+            value = l2.inc(key, delta)
+            self._publish(l2, [key])
+            return value
+        except redis.RedisError as e:
+            self._l2_failed(e)
+            return None
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
+    def get_stats(self):
+        """Per-namespace hit/miss counters for this process"""
+        return {
+            'l1_entries': len(self._l1),
+            'redis_available': time.monotonic() >= self._l2_down_until,
+            'namespaces': {ns: dict(counters) for ns, counters in self.stats.items()}
+        }
@@ -0,0 +1,21 @@
+from flask import current_app
+from app import cache
+
+# Per-section cache lifetimes; every section is also invalidated on writes
+SECTION_TIMEOUTS = {
+    'feedings': 300,
+    'medications': 300,
+    'stats': 600,
+}
+
+def dashboard_cache_key(section, user_id):
+    """Cache key for one dashboard section of a user"""
+    return f"dashboard:{section}:{user_id}"
+
+def invalidate_dashboard(user_id, *sections):
+    """Drop cached dashboard sections after the underlying data changes"""
+    sections = sections or tuple(SECTION_TIMEOUTS)
+    try:
+        cache.delete_many(*[dashboard_cache_key(section, user_id) for section in sections])
+    except Exception as e:
+        current_app.logger.warning(f"Dashboard cache invalidation failed: {str(e)}")
@@ -0,0 +1,242 @@
+"""Read-replica routing for the SQLAlchemy session.
+
+Replicas are configured as binds named ``replica_0``, ``replica_1``, ...
+(from SQLALCHEMY_REPLICA_URLS). Reads go to a healthy replica when:
+
+- the request is a GET/HEAD and the user hasn't written recently, or
+- the code asked for it explicitly with ``read_from_replica()`` (reports).
+
+Everything else uses the primary: writes and flushes, the rest of a session
+once it has written, requests pinned by a recent write of the same user
+(read-your-writes via a timestamp in the Flask session), and any time no
+replica is healthy or within the allowed lag.
+
+Health and lag are refreshed by a background thread every
+REPLICA_CHECK_INTERVAL seconds, so a replica that is down never blocks a
+request on its connect timeout; requests only read the last known state.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, request, session as flask_session, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from app.utils.sharding import shard_router
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+PIN_SESSION_KEY = '_primary_until'
+
+# Seconds a replica is behind the primary; 0 when it has replayed everything it received
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def replica_binds(urls, engine_options=None, connect_timeout=None):
+    """SQLALCHEMY_BINDS entries for a list of replica URLs"""
+    binds = {}
+    for i, url in enumerate(urls):
+        options = {'url': url, **(engine_options or {})}
+        if connect_timeout and url.startswith('postgresql'):
+            # Fail fast on an unreachable replica instead of waiting out the OS TCP timeout
+            options['connect_args'] = {**options.get('connect_args', {}), 'connect_timeout': connect_timeout}
+        binds[f"{REPLICA_BIND_PREFIX}{i}"] = options
+    return binds
+
+class ReplicaRouter:
+    """Tracks replica health and lag, and picks a replica for reads"""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_lag_seconds = 5.0
+        self.check_interval = 10.0
+        self.pin_seconds = 5.0
+        self.status = {}
+        self.app = None
+        self._db = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app, db):
+        self.app = app
+        self._db = db
+        self.max_lag_seconds = app.config.get('REPLICA_MAX_LAG_SECONDS', self.max_lag_seconds)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.pin_seconds = app.config.get('REPLICA_PIN_SECONDS', self.pin_seconds)
+        self.enabled = any(key and key.startswith(REPLICA_BIND_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS', {}))
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            for key, engine in db.engines.items():
+                if key and key.startswith(REPLICA_BIND_PREFIX):
+                    self.status[key] = {'healthy': True, 'lag_seconds': None, 'error': None}
+                    event.listen(engine, 'handle_error', self._on_error(key))
+
+        app.after_request(self._pin_after_write)
+        app.logger.info(f"Read replicas enabled: {', '.join(sorted(self.status))}")
+
+        if not app.config.get('TESTING'):
+            from app.utils.worker_boot import worker_boot
+            worker_boot.start_in_worker(self.start)
+
+    def _on_error(self, key):
+        def handle_error(context):
+            # Connection-level failures take the replica out until the next check
+            if context.is_disconnect or context.connection is None:
+                self.status[key] = {'healthy': False, 'lag_seconds': None, 'error': str(context.original_exception)}
+        return handle_error
+
+    def check(self, db, force=False):
+        """Refresh replica health and lag, at most once per check interval"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is checking
+        try:
+            self._last_check = now
+            for key in self.status:
+                engine = db.engines[key]
+                try:
+                    with engine.connect() as conn:
+                        if engine.dialect.name == 'postgresql':
+                            lag = float(conn.execute(POSTGRES_LAG_SQL).scalar() or 0)
+                        else:
+                            conn.execute(text('SELECT 1'))
+                            lag = 0.0
+                    self.status[key] = {'healthy': lag <= self.max_lag_seconds, 'lag_seconds': lag, 'error': None}
+                except Exception as e:
+                    self.status[key] = {'healthy': False, 'lag_seconds': None, 'error': str(e)}
+                    current_app.logger.warning(f"Replica {key} unavailable, reading from primary: {e}")
+        finally:
+            self._lock.release()
+
+    def reset_after_fork(self):
+        """Drop the lock and thread copied from the parent process (see worker_boot)"""
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background health check thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._check_loop, daemon=True)
+        self._thread.start()
+
+    def _check_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.check(self._db, force=True)
+            except Exception as e:
+                self.app.logger.error(f"Error checking replicas: {str(e)}")
+            time.sleep(self.check_interval)
+
+    def pick(self, db):
+        """A healthy replica engine, or None to use the primary"""
+        if self._thread is None or not self._thread.is_alive():
+            # No checker running here (tests, or a fork that hasn't restarted it)
+            self.check(db)
+        healthy = [key for key, status in self.status.items() if status['healthy']]
+        if not healthy:
+            return None
+        return db.engines[random.choice(healthy)]
+
+    def wants_replica(self, session):
+        if not self.enabled or session._flushing or session.info.get('wrote'):
+            return False
+        if session.info.get('use_replica'):
+            return True
+        if session.info.get('use_primary') or not has_request_context():
+            return False
+        if request.method not in READ_METHODS:
+            return False
+        return flask_session.get(PIN_SESSION_KEY, 0) < time.time()
+
+    def _pin_after_write(self, response):
+        """Keep a user on the primary briefly after their own write"""
+        if g.get('_db_wrote'):
+            flask_session[PIN_SESSION_KEY] = time.time() + self.pin_seconds
+        return response
+
+    def get_status(self):
+        return {key: dict(status) for key, status in self.status.items()}
+
+class RoutingSession(Session):
+    """Session that sends eligible reads on the default bind to a replica.
+
+    With sharding on, the per-user log tables go to their user's shard
+    instead (see utils/sharding.py); shards have no replicas.
+    """
+
+    @property
+    def connection_callable(self):
+        # Flushes ask for a connection per instance, so each row lands on its
+        # user's shard. Only while flushing: SQLAlchemy's bulk statements
+        # refuse a connection_callable and are routed by get_bind instead.
+        if shard_router.enabled and self._flushing:
+            return self._connection_for_instance
+        return None
+
+    def _connection_for_instance(self, mapper=None, instance=None, **kwargs):
+        return self.connection(bind_arguments={'mapper': mapper, 'instance': instance})
+
+    def get_bind(self, mapper=None, clause=None, bind=None, instance=None, **kwargs):
+        if bind is None and shard_router.enabled and shard_router.is_sharded(mapper, clause):
+            return shard_router.engine_for(self, instance)
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        # Only the default (primary) bind has replicas; other binds are left alone
+        if bind is not None or engine is not self._db.engines.get(None):
+            return engine
+        if clause is not None and getattr(clause, 'is_dml', False):
+            # INSERT/UPDATE/DELETE issued without a flush
+            self.info['wrote'] = True
+            if has_request_context():
+                g._db_wrote = True
+            return engine
+        if replica_router.wants_replica(self):
+            replica = replica_router.pick(self._db)
+            if replica is not None:
+                return replica
+        return engine
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _mark_session_wrote(session, flush_context, instances):
+    # Set before the flush runs so a failed INSERT (e.g. a lost create race)
+    # re-reads from the primary rather than a replica that may be behind
+    session.info['wrote'] = True
+    if has_request_context():
+        g._db_wrote = True
+
+@contextmanager
+def read_from_replica():
+    """Route this app context's reads to a replica (e.g. for report queries)"""
+    from app import db
+    session = db.session()
+    previous = session.info.get('use_replica')
+    session.info['use_replica'] = True
+    try:
+        yield
+    finally:
+        session.info['use_replica'] = previous
+
+@contextmanager
+def read_from_primary():
+    """Force reads on the primary, e.g. right before a read-modify-write"""
+    from app import db
+    session = db.session()
+    previous = session.info.get('use_primary')
+    session.info['use_primary'] = True
+    try:
+        yield
+    finally:
+        session.info['use_primary'] = previous
+
+# Global instance
+replica_router = ReplicaRouter()
@@ -0,0 +1,43 @@
+import uuid
+from sqlalchemy.types import TypeDecorator, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+
+
+class GUID(TypeDecorator):
+    """Compact UUID column that application code reads and writes as a string.
+
+    Uses the native 16-byte ``uuid`` type on PostgreSQL and a 16-byte
+    ``BINARY`` blob everywhere else (SQLite), instead of the 36-char text form.
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        if dialect.name == 'postgresql':
+            return str(value)
+        return value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return str(uuid.UUID(bytes=bytes(value)))
+        return str(uuid.UUID(str(value)))
+
+    def process_literal_param(self, value, dialect):
+        value = self.process_bind_param(value, dialect)
+        if isinstance(value, bytes):
+            return f"X'{value.hex()}'"
+        return f"'{value}'" if value is not None else 'NULL'
@@ -4,9 +4,12 @@ import json
 import io
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Union
-import pandas as pd
+import redis
 from app.models import FeedingLog, MedicationLog
-from app import db
+from app import db, cache
+from app.utils.serialization import serialize_rows
+from app.utils.redis_client import get_redis_client
+from app.utils.sharding import shard_router
 
 
 class AsyncReportGenerator:
@@ -39,14 +42,18 @@ class AsyncReportGenerator:
             if end_date:
                 query = query.filter(FeedingLog.time_given <= end_date)
                 
-            feeding_logs = query.order_by(FeedingLog.time_given.desc()).all()
+            # Every user's rows, so read each shard and merge
+            feeding_logs = shard_router.query_all(
+                query.order_by(FeedingLog.time_given.desc()),
+                key=lambda log: log.time_given or datetime.min, reverse=True
+            )
             
             if report_id:
                 self.progress[report_id]['progress'] = 60
                 await asyncio.sleep(0.1)
                 
             # Convert to dict format
-            data = [log.to_dict() for log in feeding_logs]
+            data = serialize_rows(feeding_logs)
             
             if report_id:
                 self.progress[report_id]['progress'] = 80
@@ -101,13 +108,17 @@ class AsyncReportGenerator:
             if end_date:
                 query = query.filter(MedicationLog.time_given <= end_date)
                 
-            medication_logs = query.order_by(MedicationLog.time_given.desc()).all()
+            # Every user's rows, so read each shard and merge
+            medication_logs = shard_router.query_all(
+                query.order_by(MedicationLog.time_given.desc()),
+                key=lambda log: log.time_given or datetime.min, reverse=True
+            )
             
             if report_id:
                 self.progress[report_id]['progress'] = 60
                 await asyncio.sleep(0.1)
                 
-            data = [log.to_dict() for log in medication_logs]
+            data = serialize_rows(medication_logs)
             
             if report_id:
                 self.progress[report_id]['progress'] = 80
@@ -212,6 +223,9 @@ class AsyncReportGenerator:
         
     async def _generate_excel_report(self, data: List[Dict], report_type: str) -> bytes:
         """Generate Excel format report"""
+        # pandas/openpyxl are heavy; only load them when an Excel export actually runs
+        import pandas as pd
+        
         await asyncio.sleep(0.1)  # Simulate processing
         
         if not data:
@@ -242,6 +256,8 @@ class AsyncReportGenerator:
             }
             return json.dumps(combined_data, indent=2)
         elif format.lower() == 'excel':
+            import pandas as pd
+            
             output = io.BytesIO()
             with pd.ExcelWriter(output, engine='openpyxl') as writer:
                 # Parse feeding data
@@ -266,4 +282,60 @@ class AsyncReportGenerator:
 
 
 # Global instance
-report_generator = AsyncReportGenerator()
\ No newline at end of file
+report_generator = AsyncReportGenerator()
+
+# Report status and output are shared through the cache so the web workers
+# can serve what a Celery worker produced
+REPORT_TTL = 3600
+ACTIVE_REPORTS_KEY = 'catetube:reports:active'
+
+def report_cache_key(report_id, part):
+    return f"report:{report_id}:{part}"
+
+def set_report_status(report_id, status, **fields):
+    """Record a report's status (queued, processing, completed, error)"""
+    cache.set(report_cache_key(report_id, 'status'), {'status': status, **fields}, timeout=REPORT_TTL)
+    try:
+        client = get_redis_client()
+        client.sadd(ACTIVE_REPORTS_KEY, report_id)
+        client.expire(ACTIVE_REPORTS_KEY, REPORT_TTL)
+    except redis.RedisError:
+        # The index only feeds /active; the report itself still works
+        pass
+
+def get_report_status(report_id):
+    """Status dict of a report, or None if unknown or expired"""
+    status = cache.get(report_cache_key(report_id, 'status'))
+    if status is not None and status['status'] == 'processing':
+        # Finer progress is only known to the process generating the report
+        progress = report_generator.get_progress(report_id)
+        if progress.get('status') == 'processing':
+            status = {**status, 'progress': progress.get('progress', 0)}
+    return status
+
+def store_report_result(report_id, result):
+    cache.set(report_cache_key(report_id, 'result'), result, timeout=REPORT_TTL)
+
+def get_report_result(report_id):
+    return cache.get(report_cache_key(report_id, 'result'))
+
+def discard_report(report_id):
+    """Forget a report's status and output"""
+    cache.delete_many(report_cache_key(report_id, 'status'), report_cache_key(report_id, 'result'))
+    try:
+        get_redis_client().srem(ACTIVE_REPORTS_KEY, report_id)
+    except redis.RedisError:
+        pass
+    report_generator.cleanup_progress(report_id)
+
+def list_active_reports():
+    """Status of every report that hasn't been downloaded or cleaned up"""
+    try:
+        report_ids = sorted(r.decode() for r in get_redis_client().smembers(ACTIVE_REPORTS_KEY))
+    except redis.RedisError:
+        report_ids = []
+    statuses = cache.get_many(*[report_cache_key(r, 'status') for r in report_ids]) if report_ids else []
+    return [
+        {'report_id': report_id, 'status': status['status'], 'progress': status.get('progress', 0)}
+        for report_id, status in zip(report_ids, statuses) if status is not None
+    ]
\ No newline at end of file
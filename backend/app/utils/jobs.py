@@ -0,0 +1,252 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from app.utils.metrics import record_job
+
+# Returned by a job function that handed its work to another process (see
+# schedule.offload); the outcome arrives later through Job.record_result()
+OFFLOADED = object()
+
+
+class CronSpec:
+    """Minimal 5-field cron expression: minute hour day-of-month month day-of-week
+
+    Supports ``*``, ``*/n``, ``a-b``, ``a-b/n`` and comma lists. Day of week
+    runs 0-6 with Sunday as 0 (7 is also accepted for Sunday). As in cron, when
+    both day fields are restricted a day matching either one fires.
+    """
+
+    FIELDS = [
+        ('minute', 0, 59),
+        ('hour', 0, 23),
+        ('day', 1, 31),
+        ('month', 1, 12),
+        ('weekday', 0, 7),
+    ]
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+
+        self.expression = expression
+        parsed = {}
+        for (name, low, high), part in zip(self.FIELDS, parts):
+            parsed[name] = self._parse_field(part, low, high)
+        self.minutes = parsed['minute']
+        self.hours = parsed['hour']
+        self.days = parsed['day']
+        self.months = parsed['month']
+        self.weekdays = {0 if d == 7 else d for d in parsed['weekday']}
+        self.day_restricted = parts[2] != '*'
+        self.weekday_restricted = parts[4] != '*'
+
+    @staticmethod
+    def _parse_field(part, low, high):
+        values = set()
+        for chunk in part.split(','):
+            step = 1
+            if '/' in chunk:
+                chunk, step_str = chunk.split('/', 1)
+                step = int(step_str)
+                if step <= 0:
+                    raise ValueError(f"Invalid cron step: {part!r}")
+            if chunk == '*':
+                start, end = low, high
+            elif '-' in chunk:
+                start, end = (int(x) for x in chunk.split('-', 1))
+            else:
+                start = int(chunk)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field out of range: {part!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        # Python: Monday=0 .. Sunday=6; cron: Sunday=0 .. Saturday=6
+        cron_weekday = (dt.weekday() + 1) % 7
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt):
+        """First matching minute strictly after ``dt``"""
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Bounded search; skips whole months/days/hours that can't match
+        for _ in range(100000):
+            if t.month not in self.months:
+                year, month = (t.year + 1, 1) if t.month == 12 else (t.year, t.month + 1)
+                t = t.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def __str__(self):
+        return f"cron({self.expression})"
+
+
+class IntervalSpec:
+    """Fixed interval between runs"""
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.interval = timedelta(seconds=seconds)
+
+    def next_after(self, dt):
+        return dt + self.interval
+
+    def __str__(self):
+        return f"every {int(self.interval.total_seconds())}s"
+
+
+class Job:
+    """A named scheduled job and the bookkeeping about its runs"""
+
+    def __init__(self, name, func, cron=None, interval=None, jitter_seconds=0, timeout_seconds=600):
+        if (cron is None) == (interval is None):
+            raise ValueError(f"Job {name!r} needs exactly one of cron or interval")
+
+        self.name = name
+        self.func = func
+        self.spec = CronSpec(cron) if cron else IntervalSpec(interval)
+        self.jitter_seconds = jitter_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self.next_run = None
+        self.last_run = None
+        self.last_duration_ms = None
+        self.last_rows = None
+        self.last_status = None
+        self.last_error = None
+        self.run_count = 0
+        self.running = False
+
+    def schedule_from(self, last_run, now):
+        """Work out the next run; a run missed while we were down fires right away"""
+        if last_run is None:
+            self.next_run = self._jittered(self.spec.next_after(now))
+            return
+        due = self.spec.next_after(last_run)
+        self.next_run = now if due <= now else self._jittered(due)
+
+    def _jittered(self, when):
+        if self.jitter_seconds:
+            return when + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+        return when
+
+    def is_due(self, now):
+        return not self.running and self.next_run is not None and self.next_run <= now
+
+    def run(self, app, keepalive=None, keepalive_seconds=30):
+        """Run the job in a worker thread under the app context, enforcing the timeout
+
+        Python can't kill a thread, so a job that overruns is reported as timed
+        out and stays marked running (and won't be started again) until it
+        actually returns. ``keepalive`` is called while we wait so the leader
+        lease doesn't lapse during long jobs.
+        """
+        started = datetime.now()
+        start_clock = time.perf_counter()
+        outcome = {}
+        self.running = True
+        self.last_run = started
+        self.last_status = 'running'
+
+        def target():
+            try:
+                with app.app_context():
+                    outcome['result'] = self.func()
+            except Exception as e:
+                outcome['error'] = e
+                app.logger.exception(f"Scheduled job {self.name} failed")
+            finally:
+                self.running = False
+                if outcome.get('timed_out'):
+                    self.last_duration_ms = round((time.perf_counter() - start_clock) * 1000, 1)
+
+        worker = threading.Thread(target=target, name=f"job-{self.name}", daemon=True)
+        worker.start()
+
+        deadline = start_clock + self.timeout_seconds
+        while worker.is_alive() and time.perf_counter() < deadline:
+            worker.join(min(keepalive_seconds, max(0, deadline - time.perf_counter())))
+            if keepalive and worker.is_alive():
+                keepalive()
+
+        self.run_count += 1
+        self.next_run = self._jittered(self.spec.next_after(started))
+
+        if worker.is_alive():
+            outcome['timed_out'] = True
+            self.last_status = 'timeout'
+            self.last_error = f"Exceeded timeout of {self.timeout_seconds}s"
+            app.logger.error(f"Scheduled job {self.name} timed out after {self.timeout_seconds}s")
+            record_job(self.name, 'timeout', time.perf_counter() - start_clock)
+            return
+
+        self.last_duration_ms = round((time.perf_counter() - start_clock) * 1000, 1)
+        if 'error' not in outcome and outcome.get('result') is OFFLOADED:
+            self.last_status = 'queued'
+            self.last_error = None
+            self.last_rows = None
+            app.logger.info(f"Scheduled job {self.name} sent to a worker")
+            return
+        if 'error' in outcome:
+            self.last_status = 'error'
+            self.last_error = str(outcome['error'])
+            self.last_rows = None
+        else:
+            self.last_status = 'ok'
+            self.last_error = None
+            self.last_rows = self.count_rows(outcome.get('result'))
+            app.logger.info(f"Scheduled job {self.name} finished in {self.last_duration_ms}ms ({self.last_rows} rows)")
+        record_job(self.name, self.last_status, self.last_duration_ms / 1000)
+
+    def record_result(self, status, duration_ms, rows=None, error=None):
+        """Outcome of an offloaded run, reported by the worker that ran it"""
+        self.last_status = status
+        self.last_duration_ms = duration_ms
+        self.last_rows = rows
+        self.last_error = error
+        record_job(self.name, status, duration_ms / 1000)
+
+    @staticmethod
+    def count_rows(result):
+        """Jobs return a row count, or a dict of counts"""
+        if isinstance(result, bool):
+            return None
+        if isinstance(result, int):
+            return result
+        if isinstance(result, dict):
+            return sum(v for v in result.values() if isinstance(v, int) and not isinstance(v, bool))
+        return None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'schedule': str(self.spec),
+            'jitter_seconds': self.jitter_seconds,
+            'timeout_seconds': self.timeout_seconds,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_duration_ms': self.last_duration_ms,
+            'last_rows': self.last_rows,
+            'last_status': self.last_status,
+            'last_error': self.last_error,
+            'run_count': self.run_count,
+            'running': self.running
+        }
@@ -0,0 +1,208 @@
+"""Load shedding: turn requests away early with 503 when the worker is saturated.
+
+When the database pool runs dry, requests queue for a connection for up to
+``pool_timeout`` and then fail anyway, holding a worker (and often the
+gunicorn timeout) the whole time. Instead, each request is given a priority
+and compared with how saturated this worker process is:
+
+- high: logging feedings/medications and tracker updates, never shed;
+- normal: everything else (dashboards, reads, auth);
+- low: report exports, stats and admin/maintenance routes, shed first.
+
+Saturation is the worst of in-flight requests against LOAD_SHED_MAX_IN_FLIGHT,
+checked-out connections against pool_size + max_overflow (on any bind), and
+the mean wait for a connection over the last few seconds against
+LOAD_SHED_POOL_WAIT_MS. Only time spent waiting for another request to
+return a connection to an exhausted pool counts as a wait; opening new
+connections (TLS, pre-ping, recycling) doesn't. Low priority requests are shed from LOAD_SHED_LOW_AT
+(a fraction of saturation) and normal ones from LOAD_SHED_NORMAL_AT, with
+``503`` and ``Retry-After``.
+
+In-flight counts only exceed one with threaded workers (GUNICORN_THREADS);
+the pool is shared with report, scheduler and activity threads either way.
+"""
+
+import threading
+import time
+from collections import deque
+from flask import g, jsonify, request
+from sqlalchemy.pool import QueuePool
+from app.utils.metrics import record_shed
+
+HIGH, NORMAL, LOW = 'high', 'normal', 'low'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Load balancer and monitoring endpoints answer however busy the worker is
+NEVER_SHED = ('health_check', 'metrics', 'index', 'static')
+# Shed first: (blueprint, endpoint), endpoint None for the whole blueprint
+LOW_PRIORITY = (
+    ('report', None),
+    ('admin', None),
+    ('tracker', 'tracker.get_tracker_stats'),
+    ('tracker', 'tracker.cleanup_old_trackers'),
+    ('auth', 'auth.cleanup_inactive_users'),
+)
+HIGH_PRIORITY_WRITES = ('feeding', 'medication_log', 'tracker')
+
+
+class PoolWaitTracker:
+    """Connection checkout waits over a sliding window, shared by every pool"""
+
+    def __init__(self, window_seconds=5.0, max_samples=1024, min_samples=10):
+        self.window_seconds = window_seconds
+        # Too few checkouts to judge: one slow wait in a quiet spell isn't saturation
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def mean_wait(self):
+        """Mean checkout wait in seconds over the window (0 with fewer than min_samples)"""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            if not self._samples or len(self._samples) < self.min_samples:
+                return 0.0
+            return sum(seconds for _, seconds in self._samples) / len(self._samples)
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._samples.clear()
+
+
+# Global instance
+pool_waits = PoolWaitTracker()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait on an exhausted pool (used as ``poolclass``)"""
+
+    def _do_get(self):
+        # Only an exhausted pool makes a checkout wait; otherwise it gets an idle
+        # connection or opens one, which is connect latency rather than load
+        if self._max_overflow < 0 or self.checkedout() < self.size() + self._max_overflow:
+            pool_waits.record(0.0)
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_waits.record(time.perf_counter() - start)
+
+
+class LoadShedder:
+    """Counts in-flight requests and sheds low-priority ones under saturation"""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_in_flight = 32
+        self.pool_wait_threshold = 0.25
+        self.low_at = 0.7
+        self.normal_at = 0.9
+        self.retry_after = 5
+        self.pool_capacity = None
+        self.in_flight = 0
+        self.shed = {NORMAL: 0, LOW: 0}
+        self._lock = threading.Lock()
+        self._db = None
+
+    def init_app(self, app, db):
+        self._db = db
+        self.enabled = app.config.get('LOAD_SHED_ENABLED', True)
+        self.max_in_flight = app.config.get('LOAD_SHED_MAX_IN_FLIGHT', 32)
+        self.pool_wait_threshold = app.config.get('LOAD_SHED_POOL_WAIT_MS', 250) / 1000
+        self.low_at = app.config.get('LOAD_SHED_LOW_AT', 0.7)
+        self.normal_at = app.config.get('LOAD_SHED_NORMAL_AT', 0.9)
+        self.retry_after = app.config.get('LOAD_SHED_RETRY_AFTER', 5)
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        if 'pool_size' in options:
+            self.pool_capacity = options['pool_size'] + options.get('max_overflow', 0)
+
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def priority(self):
+        """Priority of the current request"""
+        for blueprint, endpoint in LOW_PRIORITY:
+            if request.blueprint == blueprint and endpoint in (None, request.endpoint):
+                return LOW
+        if request.method in WRITE_METHODS and request.blueprint in HIGH_PRIORITY_WRITES:
+            return HIGH
+        return NORMAL
+
+    def pool_utilization(self):
+        """Highest share of pool capacity checked out on any bind"""
+        if not self.pool_capacity:
+            return 0.0
+        utilization = 0.0
+        for engine in self._db.engines.values():
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                utilization = max(utilization, pool.checkedout() / self.pool_capacity)
+        return utilization
+
+    def saturation(self):
+        """0 when idle, 1 when in-flight requests, the pool or pool waits hit their limit"""
+        return max(
+            self.in_flight / self.max_in_flight,
+            self.pool_utilization(),
+            pool_waits.mean_wait() / self.pool_wait_threshold,
+        )
+
+    def should_shed(self, priority):
+        if priority == HIGH:
+            return False
+        threshold = self.low_at if priority == LOW else self.normal_at
+        return self.saturation() >= threshold
+
+    def _before_request(self):
+        if request.endpoint in NEVER_SHED:
+            return None
+        priority = self.priority()
+        if self.should_shed(priority):
+            with self._lock:
+                self.shed[priority] += 1
+            record_shed(priority)
+            # Low priority clients back off longer so normal traffic recovers first
+            retry_after = self.retry_after * (2 if priority == LOW else 1)
+            response = jsonify({'error': 'Server is busy, please try again shortly', 'retry_after': retry_after})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        with self._lock:
+            self.in_flight += 1
+        g._load_shed_counted = True
+        return None
+
+    def _teardown_request(self, exc):
+        if g.pop('_load_shed_counted', False):
+            with self._lock:
+                self.in_flight -= 1
+
+    def reset_after_fork(self):
+        """Start counting from zero in a forked worker"""
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = {NORMAL: 0, LOW: 0}
+        pool_waits.reset()
+
+    def stats(self):
+        """Current load and shed counters for this process"""
+        return {
+            'enabled': self.enabled,
+            'in_flight': self.in_flight,
+            'pool_utilization': round(self.pool_utilization(), 3),
+            'pool_wait_ms': round(pool_waits.mean_wait() * 1000, 1),
+            'saturation': round(self.saturation(), 3),
+            'shed': dict(self.shed),
+            'thresholds': {'low': self.low_at, 'normal': self.normal_at},
+        }
+
+
+# Global instance
+load_shedder = LoadShedder()
@@ -1,10 +1,99 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import time
+import uuid
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
+from flask import g, request, has_request_context
+
+# LogRecord attributes that aren't user-supplied ``extra`` fields
+STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class RequestContextFilter(logging.Filter):
+    """Attach request id, user id and route to records.
+
+    Attached to the QueueHandler, so it runs in the caller's thread before the
+    record is queued; the listener thread has no request context to read.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            # Only report a user already loaded; logging must not trigger load_user
+            user = g.get('_login_user')
+            if user is not None and getattr(user, 'is_authenticated', False):
+                record.user_id = user.id
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including request context and ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler that keeps records structured for the JSON formatter.
+
+    The stock ``prepare`` flattens the record into a formatted string; here the
+    message args and traceback are resolved in the caller (they may not pickle
+    or survive the thread hop) and everything else is left as fields.
+    """
+
+    dropped = 0
+
+    def enqueue(self, record):
+        # Never block or raise in the request path; drop when the writer is behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
 
 def setup_logging(app):
-    """Setup production logging configuration"""
+    """Setup production logging configuration
+
+    Log calls only enqueue the record; a QueueListener thread formats it as
+    JSON and does the file I/O.
+    """
     
     # Don't setup logging in testing
     if app.config.get('TESTING'):
@@ -25,10 +114,9 @@ def setup_logging(app):
         maxBytes=10240000,  # 10MB
         backupCount=10
     )
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
+    file_handler.setFormatter(JSONFormatter())
     file_handler.setLevel(log_level)
+    handlers = [file_handler]
     
     # Console handler for development
     if app.config.get('DEBUG'):
@@ -37,14 +125,72 @@ def setup_logging(app):
             '%(asctime)s %(levelname)s: %(message)s'
         ))
         console_handler.setLevel(log_level)
-        app.logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
-    app.logger.addHandler(file_handler)
+    log_queue = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000))
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(DebugSamplingFilter(app.config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)))
+    queue_handler.setLevel(log_level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions['log_listener'] = listener
+    
+    app.logger.addHandler(queue_handler)
     app.logger.setLevel(log_level)
+
+    if app.config.get('LOG_REQUESTS', True):
+        register_request_logging(app)
     
     # Log startup
     app.logger.info(f'CatETube Tracker startup - Environment: {os.getenv("FLASK_ENV", "unknown")}')
 
+def restart_log_listener(app):
+    """Give a forked worker its own log queue and writer thread.
+
+    The listener thread doesn't survive fork, and records still queued in the
+    parent are the parent's to write.
+    """
+    listener = app.extensions.get('log_listener')
+    if listener is None:
+        return
+    atexit.unregister(listener.stop)
+    log_queue = queue.Queue(maxsize=listener.queue.maxsize)
+    for handler in app.logger.handlers:
+        if isinstance(handler, QueueHandler):
+            handler.queue = log_queue
+    listener = QueueListener(log_queue, *listener.handlers, respect_handler_level=listener.respect_handler_level)
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions['log_listener'] = listener
+
+def register_request_logging(app):
+    """Assign each request an id (X-Request-ID) and log one line per request with its latency"""
+
+    @app.before_request
+    def start_request_log():
+        if not g.get('request_id'):
+            g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g._log_request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_request_log(response):
+        start = g.pop('_log_request_start', None)
+        if start is None:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        app.logger.info(
+            f"{request.method} {request.path} {response.status_code}",
+            extra={
+                'event_type': 'request',
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+        )
+        return response
+
 def get_logger(name):
     """Get a logger instance for a specific module"""
     return logging.getLogger(name)
@@ -0,0 +1,184 @@
+"""Prometheus metrics for the API, database pool, cache, reports and scheduler.
+
+Metrics are only collected when ``prometheus_client`` is installed. Under
+gunicorn, set ``PROMETHEUS_MULTIPROC_DIR`` so every worker writes its samples
+to a shared directory and ``/metrics`` aggregates them (see gunicorn.conf.py).
+"""
+
+import os
+import time
+from flask import Response, g, request, abort, has_request_context
+from sqlalchemy import event
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+if prometheus_client is not None:
+    # Processes not started by gunicorn (celery, flask CLI) still need the directory
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+    REQUEST_LATENCY = Histogram(
+        'catetube_request_duration_seconds', 'Request latency',
+        ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS
+    )
+    REQUEST_COUNT = Counter(
+        'catetube_requests_total', 'Requests by response status',
+        ['blueprint', 'endpoint', 'method', 'status']
+    )
+    DB_QUERIES = Histogram(
+        'catetube_db_queries_per_request', 'SQL statements executed per request',
+        ['blueprint', 'endpoint'], buckets=QUERY_COUNT_BUCKETS
+    )
+    DB_TIME = Histogram(
+        'catetube_db_seconds_per_request', 'Time spent in SQL per request',
+        ['blueprint', 'endpoint'], buckets=LATENCY_BUCKETS
+    )
+    POOL_CHECKED_OUT = Gauge(
+        'catetube_db_pool_checked_out', 'Connections checked out of the pool',
+        multiprocess_mode='livesum'
+    )
+    POOL_OVERFLOW = Gauge(
+        'catetube_db_pool_overflow', 'Connections opened beyond pool_size',
+        multiprocess_mode='livesum'
+    )
+    CACHE_REQUESTS = Counter(
+        'catetube_cache_requests_total', 'Cache lookups by namespace and tier',
+        ['namespace', 'result']
+    )
+    REQUESTS_SHED = Counter(
+        'catetube_requests_shed_total', 'Requests turned away with 503 by load shedding',
+        ['priority']
+    )
+    WORKER_BOOT = Histogram(
+        'catetube_worker_boot_seconds', 'Time from fork until a gunicorn worker is warmed up',
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    )
+    REPORTS_IN_PROGRESS = Gauge(
+        'catetube_report_jobs_in_progress', 'Report exports queued or running',
+        multiprocess_mode='livesum'
+    )
+    REPORT_QUEUE_DEPTH = Gauge(
+        'catetube_report_queue_depth', 'Report tasks waiting in the Celery reports queue',
+        multiprocess_mode='livemax'
+    )
+    JOB_DURATION = Histogram(
+        'catetube_scheduler_job_duration_seconds', 'Scheduled job run time',
+        ['job', 'status'], buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600)
+    )
+
+def metrics_enabled():
+    return prometheus_client is not None
+
+def record_cache(namespace, result):
+    """Count a cache lookup (result is l1_hits, l2_hits or misses)"""
+    if prometheus_client is not None:
+        CACHE_REQUESTS.labels(namespace, result).inc()
+
+def record_job(name, status, duration_seconds):
+    """Record a finished scheduler job run"""
+    if prometheus_client is not None:
+        JOB_DURATION.labels(name, status).observe(duration_seconds)
+
+def record_shed(priority):
+    """Count a request rejected by the load shedder"""
+    if prometheus_client is not None:
+        REQUESTS_SHED.labels(priority).inc()
+
+def record_worker_boot(seconds):
+    if prometheus_client is not None:
+        WORKER_BOOT.observe(seconds)
+
+def report_started():
+    if prometheus_client is not None:
+        REPORTS_IN_PROGRESS.inc()
+
+def report_finished():
+    if prometheus_client is not None:
+        REPORTS_IN_PROGRESS.dec()
+
+def _route_labels():
+    endpoint = request.endpoint or 'unmatched'
+    return request.blueprint or 'app', endpoint
+
+def init_metrics(app, db):
+    """Instrument requests and SQL, and register the /metrics endpoint"""
+    if prometheus_client is None:
+        app.logger.info("prometheus_client not installed, /metrics disabled")
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+        g._db_queries = 0
+        g._db_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is None or request.endpoint == 'metrics':
+            return response
+        blueprint, endpoint = _route_labels()
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(blueprint, endpoint, request.method, response.status_code).inc()
+        DB_QUERIES.labels(blueprint, endpoint).observe(g.get('_db_queries', 0))
+        DB_TIME.labels(blueprint, endpoint).observe(g.get('_db_seconds', 0.0))
+
+        pool = db.engine.pool
+        if hasattr(pool, 'checkedout'):
+            POOL_CHECKED_OUT.set(pool.checkedout())
+            POOL_OVERFLOW.set(max(pool.overflow(), 0))
+        return response
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_metrics_query_start', []).append(time.perf_counter())
+
+    def query_finished(conn):
+        started = conn.info['_metrics_query_start'].pop()
+        if has_request_context():
+            g._db_queries = g.get('_db_queries', 0) + 1
+            g._db_seconds = g.get('_db_seconds', 0.0) + time.perf_counter() - started
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_finished(conn)
+
+    def handle_error(context):
+        # A failed statement gets no after_cursor_execute; pop its start time
+        # here or the stack on this pooled connection grows with every failure
+        if context.connection is not None and context.connection.info.get('_metrics_query_start'):
+            query_finished(context.connection)
+
+    # Queries on every bind (replicas, shards) count towards the request
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(engine, 'handle_error', handle_error)
+
+    token = app.config.get('METRICS_TOKEN')
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        from app.celery_app import queue_depth, REPORTS_QUEUE
+        depth = queue_depth(app, REPORTS_QUEUE)
+        if depth is not None:
+            REPORT_QUEUE_DEPTH.set(depth)
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import CollectorRegistry, multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    from app import limiter
+    limiter.exempt(metrics)
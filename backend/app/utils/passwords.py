@@ -0,0 +1,89 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+@lru_cache(maxsize=8)
+def stored_method(method):
+    """The method prefix werkzeug writes for ``method``, with defaults filled in
+    (``scrypt`` is stored as ``scrypt:32768:8:1``)"""
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+class PasswordHasher:
+    """Password hashing run in a bounded process pool.
+
+    PBKDF2/scrypt are CPU-bound and hold the GIL, so hashing inline stalls the
+    worker for the whole hash. A small pool per process caps how many hashes
+    run at once and keeps them off the request thread. Setting
+    ``PASSWORD_HASH_WORKERS=0`` hashes inline instead.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, salt_length=16, workers=2, timeout=10):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_HASH_SALT_LENGTH', self.salt_length)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+
+    def _executor(self):
+        # Pools don't survive fork, so each gunicorn worker builds its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        return self._executor().submit(func, *args).result(timeout=self.timeout)
+
+    def hash(self, password):
+        """Hash a password with the configured algorithm and cost"""
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        if not password_hash:
+            return False
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with a different algorithm or cost"""
+        return bool(password_hash) and password_hash.split('$', 1)[0] != stored_method(self.method)
+
+    def warm_up(self):
+        """Start the pool's processes now instead of on the first login"""
+        stored_method(self.method)  # costs one hash, cached for needs_rehash
+        if not self.workers:
+            return 0
+        executor = self._executor()
+        futures = [executor.submit(os.getpid) for _ in range(self.workers)]
+        return len({future.result(timeout=self.timeout) for future in futures})
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._pool_pid = None
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,173 @@
+"""Rate limiter key function and Redis storage with an in-process fallback"""
+
+import threading
+import time
+from flask import current_app, g, request, has_request_context
+from flask_login import current_user
+from limits.storage import Storage, MovingWindowSupport, MemoryStorage, RedisStorage
+from app.utils.tracing import tracer
+
+# Process-wide limiter counters, reported by the admin API
+rate_limit_stats = {
+    'calls': 0,
+    'fallback_calls': 0,
+    'redis_failures': 0,
+    'circuit_opened': 0,
+    'total_ms': 0.0,
+}
+
+def rate_limit_key():
+    """Bucket authenticated users by account and everyone else by client IP.
+
+    Keying on the user id keeps a clinic behind one NAT from sharing a
+    single bucket once its staff are logged in. The IP is the socket peer,
+    or the trusted proxy's client when TRUSTED_PROXY_COUNT is set (ProxyFix).
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+class CircuitBreaker:
+    """Open after consecutive failures, let one probe through after a cool-down"""
+
+    def __init__(self, failure_threshold=3, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """Returns True when this failure opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if was_open or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._probing = False
+                return not was_open
+            return False
+
+class FallbackRedisStorage(Storage, MovingWindowSupport):
+    """Redis limiter storage that falls back to in-process counters.
+
+    Slow or failing Redis calls (bounded by short socket timeouts) trip a
+    circuit breaker; while it is open, limits are enforced per worker from
+    memory instead of raising on every limited route. Selected with a
+    ``fallback+redis://`` storage URI.
+    """
+
+    STORAGE_SCHEME = ['fallback+redis', 'fallback+rediss']
+
+    def __init__(self, uri, failure_threshold=3, recovery_timeout=30, **options):
+        super().__init__(uri, **options)
+        self.primary = RedisStorage(uri.replace('fallback+', '', 1), **options)
+        self.fallback = MemoryStorage()
+        self.breaker = CircuitBreaker(int(failure_threshold), float(recovery_timeout))
+
+    def _call(self, method, *args, **kwargs):
+        start = time.perf_counter()
+        span = tracer.start_span(f'ratelimit.{method}', **{'ratelimit.breaker': self.breaker.state})
+        try:
+            if self.breaker.allow():
+                try:
+                    result = getattr(self.primary, method)(*args, **kwargs)
+                    self.breaker.record_success()
+                    return result
+                except Exception:
+                    rate_limit_stats['redis_failures'] += 1
+                    if self.breaker.record_failure():
+                        rate_limit_stats['circuit_opened'] += 1
+            rate_limit_stats['fallback_calls'] += 1
+            if span is not None:
+                span.set_attribute('ratelimit.fallback', True)
+            return getattr(self.fallback, method)(*args, **kwargs)
+        finally:
+            tracer.end_span(span)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            rate_limit_stats['calls'] += 1
+            rate_limit_stats['total_ms'] += elapsed_ms
+            if has_request_context():
+                g._rate_limit_ms = g.get('_rate_limit_ms', 0.0) + elapsed_ms
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        return self._call('incr', key, expiry, elastic_expiry=elastic_expiry, amount=amount)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def get_expiry(self, key):
+        return self._call('get_expiry', key)
+
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        return self._call('acquire_entry', key, limit, expiry, amount=amount)
+
+    def get_moving_window(self, key, limit, expiry):
+        return self._call('get_moving_window', key, limit, expiry)
+
+    def clear(self, key):
+        self.fallback.clear(key)
+        return self._call('clear', key)
+
+    def reset(self):
+        self.fallback.reset()
+        return self._call('reset')
+
+    def check(self):
+        # Storage stays usable while the fallback is serving
+        return True
+
+    def reset_after_fork(self):
+        """New connections, counters and breaker for a forked worker"""
+        self.primary.storage.connection_pool.reset()
+        self.fallback = MemoryStorage()
+        self.breaker = CircuitBreaker(self.breaker.failure_threshold, self.breaker.recovery_timeout)
+
+    def ping(self):
+        """Connect to Redis ahead of the first request (through the breaker)"""
+        if not self.breaker.allow():
+            return False
+        if self.primary.check():
+            self.breaker.record_success()
+            return True
+        self.breaker.record_failure()
+        return False
+
+def get_rate_limit_stats():
+    """Limiter overhead and fallback counters for this process"""
+    stats = dict(rate_limit_stats)
+    stats['avg_ms'] = round(stats['total_ms'] / stats['calls'], 3) if stats['calls'] else 0.0
+    stats['total_ms'] = round(stats['total_ms'], 1)
+    return stats
+
+def add_rate_limit_timing(response):
+    """Report time spent in limiter storage for this request as Server-Timing (debug only)"""
+    elapsed_ms = g.get('_rate_limit_ms')
+    if elapsed_ms is not None and current_app.debug:
+        response.headers.add('Server-Timing', f'ratelimit;dur={elapsed_ms:.2f}')
+    return response
@@ -0,0 +1,29 @@
+import os
+import threading
+import redis
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis_client():
+    """Get the shared Redis client for this process (created lazily)"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+                    socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0')),
+                    socket_connect_timeout=float(os.getenv('REDIS_CONNECT_TIMEOUT', '1.0'))
+                )
+    return _client
+
+
+def reset_redis_client():
+    """Drop the shared client so the next call reconnects"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.connection_pool.disconnect()
+        _client = None
@@ -1,139 +1,323 @@
+import json
+import os
+import socket
 import threading
 import time
+import uuid
 from datetime import date, datetime, timedelta
+import redis
+from flask import current_app
 from app.models import DailyFeedingTracker, User
 from app import db
+from app.utils.jobs import Job, OFFLOADED
+from app.utils.redis_client import get_redis_client
+from app.utils.sharding import shard_router
+from app.utils.tracker_cache import warm_trackers
+
+LEADER_KEY = 'catetube:scheduler:leader'
+JOB_STATE_KEY = 'catetube:scheduler:jobs'
+RUN_REQUESTS_KEY = 'catetube:scheduler:run_requests'
+JOB_RESULTS_KEY = 'catetube:scheduler:job_results'
+
+class SchedulerLease:
+    """Redis lease so exactly one process across the deployment runs scheduled jobs"""
+
+    # Only extend/release the lease if we still own it
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, key=LEADER_KEY, ttl_seconds=120):
+        self.key = key
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.token = None
+        self.is_leader = False
+        self.enabled = os.getenv('SCHEDULER_LEADER_ELECTION', 'true').lower() == 'true'
+
+    def acquire_or_renew(self):
+        """Try to become (or stay) leader. Returns True while this process holds the lease."""
+        if not self.enabled:
+            self.is_leader = True
+            return True
+
+        if self.token is None:
+            self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+
+        try:
+            client = get_redis_client()
+            if self.is_leader:
+                self.is_leader = bool(client.eval(self.RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+            else:
+                self.is_leader = bool(client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        except redis.RedisError:
+            # Without Redis we can't prove we're the only runner, so stand down
+            self.is_leader = False
+        return self.is_leader
+
+    def release(self):
+        """Give up the lease so another process can take over immediately"""
+        if self.enabled and self.is_leader and self.token:
+            try:
+                get_redis_client().eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+            except redis.RedisError:
+                pass
+        self.is_leader = False
+
+def cleanup_old_trackers(days_to_keep=30):
+    """Clean up trackers older than specified days"""
+    cutoff_date = date.today() - timedelta(days=days_to_keep)
+
+    count = 0
+    for _ in shard_router.each_shard():
+        old_trackers = DailyFeedingTracker.query.filter(
+            DailyFeedingTracker.target_date < cutoff_date
+        ).all()
+
+        count += len(old_trackers)
+        if old_trackers:
+            for tracker in old_trackers:
+                db.session.delete(tracker)
+
+            db.session.commit()
+    return count
+
+def cleanup_inactive_users():
+    """Clean up inactive users based on last login activity"""
+    return User.cleanup_inactive_users()
+
+def precreate_tomorrow_trackers():
+    """Create tomorrow's trackers for all active users and warm the tracker cache"""
+    target_date = date.today() + timedelta(days=1)
+    created = DailyFeedingTracker.precreate_for_date(target_date)
+
+    warmed = 0
+    batch = []
+    if shard_router.enabled:
+        # Can't join users on a shard; precreate only made trackers for active users anyway
+        query = DailyFeedingTracker.query.filter(DailyFeedingTracker.target_date == target_date)
+    else:
+        query = DailyFeedingTracker.query.join(User).filter(
+            DailyFeedingTracker.target_date == target_date,
+            User.is_active == True
+        )
+    for _ in shard_router.each_shard():
+        for tracker in query.yield_per(1000):
+            batch.append(tracker)
+            if len(batch) >= 1000:
+                warmed += warm_trackers(batch)
+                batch = []
+        warmed += warm_trackers(batch)
+        batch = []
+
+    return {'created': created, 'warmed': warmed}
+
+def offload(task_name, func):
+    """Job function that hands the work to a Celery maintenance worker.
+
+    The scheduler still decides when jobs run (one leader), but with a broker
+    configured the work itself leaves the web process. The job then shows as
+    queued until the task reports its outcome (report_job_result). Without a
+    broker (Celery eager mode) the job runs here as before.
+    """
+    def run():
+        celery_app = current_app.extensions.get('celery')
+        if celery_app is None or celery_app.conf.task_always_eager:
+            return func()
+        celery_app.send_task(f'app.tasks.{task_name}')
+        return OFFLOADED
+    run.__name__ = func.__name__
+    return run
+
+def report_job_result(name, status, duration_ms, rows=None, error=None):
+    """Hand an offloaded job's outcome to the scheduler leader (called by the Celery task)"""
+    result = {'status': status, 'duration_ms': duration_ms, 'rows': rows, 'error': error}
+    try:
+        get_redis_client().hset(JOB_RESULTS_KEY, name, json.dumps(result))
+    except redis.RedisError as e:
+        current_app.logger.warning(f"Could not report result of job {name}: {str(e)}")
 
 class TrackerScheduler:
     """Scheduler for automatic tracker reset and maintenance"""
-    
-    def __init__(self):
+
+    def __init__(self, tick_seconds=30):
         self.running = False
         self.thread = None
-        
-    def start(self):
-        """Start the scheduler"""
-        if self.running:
+        self.app = None
+        self.tick_seconds = tick_seconds
+        self.lease = SchedulerLease(ttl_seconds=tick_seconds * 4)
+        self.jobs = {}
+        self._was_leader = False
+
+    def add_job(self, name, func, cron=None, interval=None, jitter_seconds=0, timeout_seconds=600):
+        """Register a named job with either a cron expression or an interval in seconds"""
+        job = Job(name, func, cron=cron, interval=interval,
+                  jitter_seconds=jitter_seconds, timeout_seconds=timeout_seconds)
+        self.jobs[name] = job
+        return job
+
+    def register_default_jobs(self):
+        """Maintenance jobs, spread across off-peak hours"""
+        if self.jobs:
             return
-            
+        self.add_job('cleanup_old_trackers', offload('cleanup_old_trackers', cleanup_old_trackers),
+                     cron='15 2 * * *', jitter_seconds=300, timeout_seconds=900)
+        self.add_job('cleanup_inactive_users', offload('cleanup_inactive_users', cleanup_inactive_users),
+                     cron='45 3 * * *', jitter_seconds=300, timeout_seconds=1800)
+        # Trackers follow the server date, so build tomorrow's just before server midnight
+        self.add_job('precreate_trackers', offload('precreate_trackers', precreate_tomorrow_trackers),
+                     cron='40 23 * * *', jitter_seconds=120, timeout_seconds=900)
+
+    def start(self, app):
+        """Start the scheduler, reusing the given app for every job"""
+        # A forked process inherits running=True but not the thread
+        if self.running and self.thread and self.thread.is_alive():
+            return
+
+        self.app = app
+        self.register_default_jobs()
         self.running = True
         self.thread = threading.Thread(target=self._schedule_loop, daemon=True)
         self.thread.start()
-        # print("Tracker scheduler started")
-        
+
     def stop(self):
         """Stop the scheduler"""
         self.running = False
         if self.thread and self.thread.is_alive():
             self.thread.join()
-        # print("Tracker scheduler stopped")
-        
+        self.lease.release()
+
     def _schedule_loop(self):
         """Main scheduler loop"""
-        last_date = date.today()
-        
         while self.running:
             try:
-                current_date = date.today()
-                
-                # Check if we've crossed midnight
-                if current_date != last_date:
-                    # print(f"Date changed from {last_date} to {current_date}")
-                    self._handle_new_day()
-                    last_date = current_date
-                
-                # Sleep for 1 minute before checking again
-                time.sleep(60)
-                
+                # Only the lease holder runs jobs; everyone else just keeps trying
+                if self.lease.acquire_or_renew():
+                    if not self._was_leader:
+                        self._on_became_leader()
+                    self._collect_job_results()
+                    self._run_requested_jobs()
+                    self._run_due_jobs()
+                self._was_leader = self.lease.is_leader
+
             except Exception as e:
-                # print(f"Error in scheduler loop: {str(e)}")
-                time.sleep(60)  # Wait before retrying
-                
-    def _handle_new_day(self):
-        """Handle tasks for a new day"""
+                self.app.logger.exception(f"Error in scheduler loop: {str(e)}")
+
+            time.sleep(self.tick_seconds)
+
+    def _on_became_leader(self):
+        """Pick up where the previous leader left off, catching up missed runs"""
+        now = datetime.now()
+        saved = self._load_job_states()
+        for name, job in self.jobs.items():
+            state = saved.get(name, {})
+            last_run = datetime.fromisoformat(state['last_run']) if state.get('last_run') else None
+            job.schedule_from(last_run, now)
+            if job.next_run <= now:
+                self.app.logger.info(f"Catching up missed run of job {name} (last run {last_run})")
+        self.app.logger.info(f"Scheduler leadership acquired by pid {os.getpid()}")
+
+    def _run_due_jobs(self):
+        for job in self.jobs.values():
+            if job.is_due(datetime.now()):
+                self.run_job(job.name)
+
+    def _run_requested_jobs(self):
+        """Run jobs queued through the admin endpoint"""
         try:
-            # Clean up old trackers (keep last 30 days)
-            self._cleanup_old_trackers(days_to_keep=30)
-            
-            # Check user activity and cleanup inactive users
-            self._cleanup_inactive_users()
-            
-            # Note: New trackers are created automatically when needed
-            # via get_or_create_today_tracker() in the routes
-            
-            # print("New day setup completed")
-            
-        except Exception as e:
-            # print(f"Error handling new day: {str(e)}")
+            client = get_redis_client()
+            name = client.spop(RUN_REQUESTS_KEY)
+            while name:
+                name = name.decode()
+                if name in self.jobs and not self.jobs[name].running:
+                    self.run_job(name)
+                name = client.spop(RUN_REQUESTS_KEY)
+        except redis.RedisError:
             pass
-            
-    def _cleanup_old_trackers(self, days_to_keep=30):
-        """Clean up trackers older than specified days"""
+
+    def _collect_job_results(self):
+        """Record outcomes of jobs that ran on a Celery worker"""
         try:
-            cutoff_date = date.today() - timedelta(days=days_to_keep)
-            
-            # Use app context for database operations
-            from app import create_app
-            app = create_app()
-            
-            with app.app_context():
-                old_trackers = DailyFeedingTracker.query.filter(
-                    DailyFeedingTracker.target_date < cutoff_date
-                ).all()
-                
-                count = len(old_trackers)
-                if count > 0:
-                    for tracker in old_trackers:
-                        db.session.delete(tracker)
-                    
-                    db.session.commit()
-                    # print(f"Cleaned up {count} old trackers")
-                else:
-                    # print("No old trackers to clean up")
-                    pass
-                    
-        except Exception as e:
-            # print(f"Error cleaning up old trackers: {str(e)}")
-            pass
-            
-    def _cleanup_inactive_users(self):
-        """Clean up inactive users based on last login activity"""
+            pipe = get_redis_client().pipeline()
+            pipe.hgetall(JOB_RESULTS_KEY)
+            pipe.delete(JOB_RESULTS_KEY)
+            raw, _ = pipe.execute()
+        except redis.RedisError:
+            return
+        for name, value in raw.items():
+            job = self.jobs.get(name.decode())
+            if job is None:
+                continue
+            job.record_result(**json.loads(value))
+            self._save_job_state(job)
+            self.app.logger.info(f"Scheduled job {job.name} finished on a worker: {job.last_status} "
+                                 f"in {job.last_duration_ms}ms ({job.last_rows} rows)")
+
+    def run_job(self, name):
+        """Run a job now and record the outcome"""
+        job = self.jobs[name]
+        job.run(self.app, keepalive=self.lease.acquire_or_renew, keepalive_seconds=self.tick_seconds)
+        self._save_job_state(job)
+        return job.to_dict()
+
+    def _save_job_state(self, job):
         try:
-            # Use app context for database operations
-            from app import create_app
-            app = create_app()
-            
-            with app.app_context():
-                result = User.cleanup_inactive_users()
-                
-                if result['deactivated'] > 0 or result['deleted'] > 0:
-                    print(f"User cleanup: {result['deactivated']} deactivated, {result['deleted']} deleted")
-                    
-        except Exception as e:
-            print(f"Error cleaning up inactive users: {str(e)}")
+            get_redis_client().hset(JOB_STATE_KEY, job.name, json.dumps(job.to_dict()))
+        except redis.RedisError:
             pass
-    
+
+    def _load_job_states(self):
+        try:
+            raw = get_redis_client().hgetall(JOB_STATE_KEY)
+            return {k.decode(): json.loads(v) for k, v in raw.items()}
+        except redis.RedisError:
+            return {}
+
+    def request_run(self, name):
+        """Ask whichever process is leader to run a job on its next tick"""
+        self.register_default_jobs()
+        if name not in self.jobs:
+            raise KeyError(name)
+        get_redis_client().sadd(RUN_REQUESTS_KEY, name)
+
+    def get_job_states(self):
+        """Job states as recorded by the leader, falling back to this process's view"""
+        self.register_default_jobs()
+        states = {name: job.to_dict() for name, job in self.jobs.items()}
+        saved = self._load_job_states()
+        for name in states:
+            if name in saved and not self.lease.is_leader:
+                states[name] = saved[name]
+        return list(states.values())
+
     def force_new_day_reset(self):
         """Manually trigger new day handling (for testing)"""
-        # print("Forcing new day reset...")
-        self._handle_new_day()
-    
+        self.run_job('cleanup_old_trackers')
+        self.run_job('cleanup_inactive_users')
+
     def force_user_cleanup(self):
         """Manually trigger user cleanup (for testing)"""
-        print("Forcing user cleanup...")
-        self._cleanup_inactive_users()
+        self.run_job('cleanup_inactive_users')
 
 # Global scheduler instance
 tracker_scheduler = TrackerScheduler()
 
-def start_scheduler():
+def start_scheduler(app):
     """Start the global tracker scheduler"""
-    tracker_scheduler.start()
-    
+    tracker_scheduler.start(app)
+
 def stop_scheduler():
     """Stop the global tracker scheduler"""
     tracker_scheduler.stop()
-    
+
 def get_scheduler():
     """Get the global scheduler instance"""
-    return tracker_scheduler
\ No newline at end of file
+    return tracker_scheduler
@@ -147,13 +147,9 @@ class SecurityAuditLogger:
         )
 
 def get_client_ip():
-    """Get client IP address, handling proxies"""
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+    """Get client IP address (trusted proxies are resolved by ProxyFix, see TRUSTED_PROXY_COUNT)"""
+    # Never read X-Forwarded-For / X-Real-IP here: clients can set them to anything
+    return request.remote_addr
 
 def generate_csrf_token():
     """Generate CSRF token for forms"""
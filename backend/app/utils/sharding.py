@@ -0,0 +1,373 @@
+"""Optional user-keyed sharding of the per-user log tables.
+
+FeedingLog, MedicationLog and DailyFeedingTracker rows can be spread over
+binds named ``shard_0``, ``shard_1``, ... (from SQLALCHEMY_SHARD_URLS, or N
+local SQLite files with SQLITE_SHARDS=N). Users and everything else stay on
+the primary. A user's rows all live on one shard, chosen by rendezvous
+hashing of the user id, so adding a shard only moves about 1/N of the users.
+
+The session (see db_routing.RoutingSession) picks the shard for a sharded
+table from, in order:
+
+- the instance being flushed (its ``user_id``),
+- an explicit ``shard_router.on_shard()`` / ``for_user()`` / ``each_shard()``,
+- the logged-in user, for ordinary per-user routes.
+
+Sharded tables can't be joined with ``user`` (different databases), and
+queries across users (exports, maintenance) go through ``each_shard()`` or
+``query_all()``. ``flask shards init|status|rebalance`` manage the shards
+and ``flask shards check`` round-trips a throwaway user through each one.
+"""
+
+import hashlib
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+import click
+from flask import has_request_context
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import inspect as sa_inspect, select, func
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.sql.util import find_tables
+
+SHARD_BIND_PREFIX = 'shard_'
+SHARDED_TABLES = ('feeding_log', 'medication_log', 'daily_feeding_tracker')
+
+class ShardKeyMissing(RuntimeError):
+    """A sharded table was queried with no user or shard to route it by"""
+
+def shard_binds(urls, engine_options=None):
+    """SQLALCHEMY_BINDS entries for a list of shard URLs"""
+    return {
+        f"{SHARD_BIND_PREFIX}{i}": {'url': url, **(engine_options or {})}
+        for i, url in enumerate(urls)
+    }
+
+def sqlite_shard_urls(count):
+    """Stand-in shards for development and tests: one SQLite file per shard"""
+    return [f"sqlite:///catelog_shard_{i}.db" for i in range(count)]
+
+@lru_cache(maxsize=65536)
+def _rendezvous(user_id, keys):
+    # Highest score wins; blake2b is stable across processes, unlike hash()
+    return max(keys, key=lambda key: hashlib.blake2b(f"{key}:{user_id}".encode(), digest_size=8).digest())
+
+class ShardRouter:
+    """Maps users to shard binds and routes sharded tables to them"""
+
+    def __init__(self):
+        self.enabled = False
+        self.keys = ()
+        self._db = None
+
+    def init_app(self, app, db):
+        self._db = db
+        self.keys = tuple(sorted(
+            (key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key and key.startswith(SHARD_BIND_PREFIX)),
+            key=lambda key: int(key[len(SHARD_BIND_PREFIX):])
+        ))
+        self.enabled = bool(self.keys)
+        app.cli.add_command(shards_cli)
+        if self.enabled:
+            app.logger.info(f"Sharding {', '.join(SHARDED_TABLES)} across {', '.join(self.keys)}")
+
+    def shard_for(self, user_id):
+        """Bind key of the shard holding a user's rows"""
+        return _rendezvous(str(user_id), self.keys)
+
+    def is_sharded(self, mapper=None, clause=None):
+        """Whether a statement targets one of the sharded tables"""
+        if mapper is not None:
+            return sa_inspect(mapper).local_table.name in SHARDED_TABLES
+        if clause is None:
+            return False
+        table = getattr(clause, 'table', None)  # INSERT/UPDATE/DELETE
+        if table is not None:
+            return getattr(table, 'name', None) in SHARDED_TABLES
+        return any(t.name in SHARDED_TABLES for t in find_tables(clause, include_crud=True))
+
+    def engine_for(self, session, instance=None):
+        """Shard engine for a sharded statement in this session"""
+        user_id = getattr(instance, 'user_id', None)
+        if user_id is not None:
+            return self._db.engines[self.shard_for(user_id)]
+        key = session.info.get('shard')
+        if key is not None:
+            return self._db.engines[key]
+        if has_request_context():
+            from flask_login import current_user
+            if current_user.is_authenticated:
+                return self._db.engines[self.shard_for(current_user.id)]
+        raise ShardKeyMissing(
+            "No shard to route to; use shard_router.for_user(), on_shard() or each_shard()"
+        )
+
+    def group_by_shard(self, items, user_id=lambda item: item):
+        """Split items by the shard of their user ({None: items} when not sharding)"""
+        if not self.enabled:
+            return {None: list(items)}
+        groups = defaultdict(list)
+        for item in items:
+            groups[self.shard_for(user_id(item))].append(item)
+        return dict(groups)
+
+    @contextmanager
+    def on_shard(self, key):
+        """Route sharded tables to one shard (no-op for None or when not sharding)"""
+        if not self.enabled or key is None:
+            yield
+            return
+        session = self._db.session()
+        previous = session.info.get('shard')
+        session.info['shard'] = key
+        try:
+            yield
+        finally:
+            session.info['shard'] = previous
+
+    def for_user(self, user_id):
+        """Route sharded tables to a given user's shard"""
+        return self.on_shard(self.shard_for(user_id) if self.enabled else None)
+
+    def each_shard(self):
+        """Run the loop body once per shard (once, unchanged, when not sharding).
+
+        Sharded objects are expunged between shards: ids are only unique
+        within a shard, so rows from different shards must not meet in one
+        identity map.
+        """
+        if not self.enabled:
+            yield None
+            return
+        session = self._db.session()
+        for key in self.keys:
+            with self.on_shard(key):
+                yield key
+                session.flush()
+            for obj in list(session.identity_map.values()):
+                if obj.__table__.name in SHARDED_TABLES:
+                    session.expunge(obj)
+
+    def query_all(self, query, key=None, reverse=False, limit=None):
+        """Run an ORM query on every shard and merge the results.
+
+        Pass ``key``/``reverse``/``limit`` matching the query's ORDER BY and
+        LIMIT to get the same rows a single database would return.
+        """
+        rows = []
+        for _ in self.each_shard():
+            rows.extend(query.all())
+        if self.enabled and key is not None:
+            rows.sort(key=key, reverse=reverse)
+        return rows[:limit] if limit is not None else rows
+
+    # -- maintenance -----------------------------------------------------
+
+    def create_tables(self):
+        """Create the sharded tables on every shard that lacks them.
+
+        Foreign keys to ``user`` are left out: users live on the primary.
+        """
+        db = self._db
+        created = []
+        for key in self.keys:
+            engine = db.engines[key]
+            with engine.begin() as conn:
+                for name in SHARDED_TABLES:
+                    table = db.metadata.tables[name]
+                    if sa_inspect(conn).has_table(name):
+                        continue
+                    conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+                    for index in table.indexes:
+                        conn.execute(CreateIndex(index))
+                    created.append(f"{key}.{name}")
+        return created
+
+    def row_counts(self, include_primary=True):
+        """Rows per sharded table on each shard (and the primary)"""
+        db = self._db
+        counts = {}
+        for key in ([None] if include_primary else []) + list(self.keys):
+            engine = db.engines[key]
+            with engine.connect() as conn:
+                existing = set(sa_inspect(conn).get_table_names())
+                counts[key or 'primary'] = {
+                    name: conn.execute(select(func.count()).select_from(db.metadata.tables[name])).scalar()
+                    for name in SHARDED_TABLES if name in existing
+                }
+        return counts
+
+    def rows_for_user(self, user_id):
+        """Rows per sharded table holding a user, on every database ({} when none)"""
+        db = self._db
+        found = {}
+        for key in [None] + list(self.keys):
+            with db.engines[key].connect() as conn:
+                existing = set(sa_inspect(conn).get_table_names())
+                for name in SHARDED_TABLES:
+                    if name not in existing:
+                        continue
+                    table = db.metadata.tables[name]
+                    count = conn.execute(select(func.count()).where(table.c.user_id == user_id)).scalar()
+                    if count:
+                        found.setdefault(key or 'primary', {})[name] = count
+        return found
+
+    def check(self):
+        """Round-trip a throwaway user on every shard; returns the problems found.
+
+        Each user logs one row per sharded table through the ORM, the rows
+        must be on that user's shard only and readable through the session,
+        and ``delete_account()`` must leave nothing behind on any database.
+        """
+        from app.models import User, FeedingLog, MedicationLog, DailyFeedingTracker
+
+        db = self._db
+        users = {}
+        while len(users) < len(self.keys):
+            user_id = str(uuid.uuid4())
+            users.setdefault(self.shard_for(user_id), user_id)
+
+        for user_id in users.values():
+            db.session.add(User(id=user_id, email=f"shard-check-{user_id}@example.com", password_hash='!'))
+            db.session.add_all([
+                FeedingLog(user_id=user_id, amount_ml=10.0),
+                MedicationLog(user_id=user_id, medication_name='Shard check', dosage='1ml', amount_ml=1.0),
+                DailyFeedingTracker(user_id=user_id, target_date=date.today()),
+            ])
+            db.session.commit()
+            # Log ids are per shard: keep one shard's rows in the identity map at a time
+            db.session.expunge_all()
+
+        problems = []
+        try:
+            for key, user_id in users.items():
+                found = self.rows_for_user(user_id)
+                if found != {key: {name: 1 for name in SHARDED_TABLES}}:
+                    problems.append(f"{key}: expected one row per table for {user_id} here only, found {found}")
+                with self.for_user(user_id):
+                    if FeedingLog.query.filter_by(user_id=user_id).count() != 1:
+                        problems.append(f"{key}: session didn't read {user_id}'s feeding back")
+        finally:
+            for user_id in users.values():
+                db.session.get(User, user_id).delete_account()
+
+        for key, user_id in users.items():
+            left = self.rows_for_user(user_id)
+            if left or db.session.get(User, user_id) is not None:
+                problems.append(f"{key}: delete_account left {user_id} or their rows behind: {left}")
+        return problems
+
+    def rebalance(self, include_primary=True, dry_run=False, log=print):
+        """Move every user's rows to the shard they hash to now.
+
+        Covers the initial move off the primary and changes in the number of
+        shards. Rows are copied to the target and committed before they are
+        deleted from the source, and rows already on the target are skipped,
+        so an interrupted run can simply be repeated. Moved rows get new ids
+        on the target. A tracker whose user/date already exists on the target
+        is kept there and the source copy dropped (counted as a conflict).
+        """
+        db = self._db
+        stats = {'users': 0, 'rows': 0, 'skipped': 0, 'conflicts': 0}
+        sources = ([None] if include_primary else []) + list(self.keys)
+        for name in SHARDED_TABLES:
+            table = db.metadata.tables[name]
+            columns = [c.name for c in table.columns if c.name != 'id']
+            for source in sources:
+                source_engine = db.engines[source]
+                with source_engine.connect() as conn:
+                    if not sa_inspect(conn).has_table(name):
+                        continue
+                    user_ids = conn.execute(select(table.c.user_id).distinct()).scalars().all()
+                for user_id in user_ids:
+                    target = self.shard_for(user_id)
+                    if target == source:
+                        continue
+                    moved = self._move_user_rows(table, columns, user_id, source_engine, db.engines[target], dry_run)
+                    stats['users'] += 1
+                    for k in ('rows', 'skipped', 'conflicts'):
+                        stats[k] += moved[k]
+                    log(f"{name}: user {user_id} {source or 'primary'} -> {target}: "
+                        f"{moved['rows']} moved, {moved['skipped']} already there, {moved['conflicts']} conflicts")
+        return stats
+
+    def _move_user_rows(self, table, columns, user_id, source_engine, target_engine, dry_run):
+        with source_engine.connect() as conn:
+            rows = conn.execute(select(table).where(table.c.user_id == user_id)).mappings().all()
+        with target_engine.connect() as conn:
+            existing = conn.execute(select(*[table.c[c] for c in columns]).where(table.c.user_id == user_id)).all()
+        existing_rows = {tuple(row) for row in existing}
+        # The tracker's unique (user_id, target_date) can clash with one created after the switch
+        existing_dates = {row[columns.index('target_date')] for row in existing} if 'target_date' in columns else set()
+
+        new_rows, skipped, conflicts = [], 0, 0
+        for row in rows:
+            values = {c: row[c] for c in columns}
+            if tuple(values[c] for c in columns) in existing_rows:
+                skipped += 1
+            elif 'target_date' in values and values['target_date'] in existing_dates:
+                conflicts += 1
+            else:
+                new_rows.append(values)
+
+        if not dry_run:
+            if new_rows:
+                with target_engine.begin() as conn:
+                    conn.execute(table.insert(), new_rows)
+            with source_engine.begin() as conn:
+                conn.execute(table.delete().where(table.c.user_id == user_id))
+        return {'rows': len(new_rows), 'skipped': skipped, 'conflicts': conflicts}
+
+# Global instance
+shard_router = ShardRouter()
+
+shards_cli = AppGroup('shards', help='Manage the log table shards.')
+
+def _require_shards():
+    if not shard_router.enabled:
+        raise click.ClickException('Sharding is off; set SQLALCHEMY_SHARD_URLS or SQLITE_SHARDS')
+
+@shards_cli.command('init')
+@with_appcontext
+def init_shards():
+    """Create the sharded tables on every shard."""
+    _require_shards()
+    created = shard_router.create_tables()
+    click.echo(f"Created {', '.join(created)}" if created else 'All shards already have their tables')
+
+@shards_cli.command('status')
+@with_appcontext
+def shards_status():
+    """Show row counts per shard."""
+    if not shard_router.enabled:
+        click.echo('Sharding is off')
+    for key, counts in shard_router.row_counts().items():
+        click.echo(f"{key}: " + ', '.join(f"{name}={count}" for name, count in counts.items()))
+
+@shards_cli.command('check')
+@with_appcontext
+def check_shards():
+    """Write, read and delete a throwaway user on every shard."""
+    _require_shards()
+    shard_router.create_tables()
+    problems = shard_router.check()
+    for problem in problems:
+        click.echo(problem)
+    if problems:
+        raise click.ClickException(f"{len(problems)} problem(s) across {len(shard_router.keys)} shards")
+    click.echo(f"OK: write, read and delete on {', '.join(shard_router.keys)}")
+
+@shards_cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Report what would move without writing.')
+@click.option('--skip-primary', is_flag=True, help="Don't move rows still on the primary.")
+@with_appcontext
+def rebalance_shards(dry_run, skip_primary):
+    """Move rows to the shard their user hashes to."""
+    _require_shards()
+    shard_router.create_tables()
+    stats = shard_router.rebalance(include_primary=not skip_primary, dry_run=dry_run, log=click.echo)
+    click.echo(f"{'Would move' if dry_run else 'Moved'} {stats['rows']} rows for {stats['users']} user/table pairs "
+               f"({stats['skipped']} already in place, {stats['conflicts']} tracker conflicts)")
@@ -0,0 +1,158 @@
+"""Opt-in per-request SQL profiling: query counts, duplicates (N+1) and slow queries.
+
+Enable with ``SQL_PROFILER_ENABLED=true``. In tests, wrap client calls in
+``sql_profiler.assert_max_queries(n)`` or decorate a route with
+``@query_budget(n)`` to fail when an endpoint issues too many statements.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint or block issued more SQL statements than allowed"""
+
+class RequestProfile:
+    """SQL statements executed while handling one request (or one block)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+
+    def duplicates(self, threshold=2):
+        """Statements run at least ``threshold`` times, most repeated first"""
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= threshold]
+
+class SQLProfiler:
+    """Records SQL per request through engine cursor events"""
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = 100
+        self.duplicate_threshold = 3
+        self.strict_budgets = False
+        self._blocks = threading.local()
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('SQL_PROFILER_ENABLED', False)
+        self.slow_query_ms = app.config.get('SQL_SLOW_QUERY_MS', self.slow_query_ms)
+        self.duplicate_threshold = app.config.get('SQL_DUPLICATE_THRESHOLD', self.duplicate_threshold)
+        # Budget overruns raise in tests and are only logged otherwise
+        self.strict_budgets = app.config.get('SQL_QUERY_BUDGET_STRICT', app.config.get('TESTING', False))
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(engine, 'handle_error', self._handle_error)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.logger.info("SQL profiler enabled")
+
+    # -- engine events ---------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_profiler_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['_profiler_query_start'].pop()) * 1000
+
+        for profile in getattr(self._blocks, 'stack', ()):
+            profile.add(statement, elapsed_ms)
+
+        if not has_request_context():
+            return
+        profile = g.get('_sql_profile')
+        if profile is not None:
+            profile.add(statement, elapsed_ms)
+        if elapsed_ms >= self.slow_query_ms:
+            current_app.logger.warning(
+                f"Slow query ({elapsed_ms:.1f}ms) on {request.method} {request.path} "
+                f"[{request.endpoint}]: {' '.join(statement.split())[:500]}"
+            )
+
+    def _handle_error(self, context):
+        # No after_cursor_execute for a failed statement: drop its start time
+        starts = context.connection.info.get('_profiler_query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    # -- request hooks ---------------------------------------------------
+
+    def _start_request(self):
+        g._sql_profile = RequestProfile()
+
+    def _finish_request(self, response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return response
+
+        duplicates = profile.duplicates(self.duplicate_threshold)
+        if duplicates:
+            statement, times = duplicates[0]
+            current_app.logger.warning(
+                f"Possible N+1 on {request.method} {request.path} [{request.endpoint}]: "
+                f"{len(duplicates)} statement(s) repeated, worst {times}x: {' '.join(statement.split())[:300]}"
+            )
+
+        budget = g.pop('_sql_query_budget', None)
+        if budget is not None and profile.count > budget:
+            message = f"{request.endpoint} issued {profile.count} queries (budget {budget})"
+            if self.strict_budgets:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+
+        if current_app.debug:
+            response.headers.add(
+                'Server-Timing',
+                f'sql;dur={profile.total_ms:.2f};desc="{profile.count} queries, {len(duplicates)} repeated"'
+            )
+        return response
+
+    # -- budgets ---------------------------------------------------------
+
+    @contextmanager
+    def assert_max_queries(self, budget):
+        """Fail if the block issues more than ``budget`` SQL statements"""
+        profile = RequestProfile()
+        stack = self._blocks.__dict__.setdefault('stack', [])
+        stack.append(profile)
+        try:
+            yield profile
+        finally:
+            stack.remove(profile)
+        if profile.count > budget:
+            repeated = ', '.join(f"{n}x {' '.join(s.split())[:80]}" for s, n in profile.duplicates())
+            raise QueryBudgetExceeded(
+                f"Expected at most {budget} queries, got {profile.count}" + (f" (repeated: {repeated})" if repeated else '')
+            )
+
+def query_budget(max_queries):
+    """Declare the most SQL statements a route should issue.
+
+    Checked when the profiler is enabled; raises QueryBudgetExceeded in
+    tests (or with SQL_QUERY_BUDGET_STRICT) and logs a warning otherwise.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g._sql_query_budget = max_queries
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Global instance
+sql_profiler = SQLProfiler()
@@ -0,0 +1,284 @@
+"""Lightweight request tracing exported as OpenTelemetry-compatible JSON.
+
+Each sampled request becomes one trace: a root span for the request plus
+child spans for the rate limiter, user loading, every SQL statement, cache
+calls and JSON serialization. Finished traces are written as one OTLP/JSON
+``resourceSpans`` document per line to a rotating local file, so no
+collector is needed (the OTel collector's filelog/otlpjsonfile receivers
+can ingest it later).
+
+The trace id follows a W3C ``traceparent`` header when present; otherwise it
+is taken from the request id (X-Request-ID), which is echoed back.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+HEX32_RE = re.compile(r'^[0-9a-f]{32}$')
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace_id, parent_id, name, kind, attributes):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or time.time_ns()),
+            'attributes': [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class Trace:
+    """Spans collected for one request"""
+
+    def __init__(self, trace_id, parent_id=None):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.spans = []
+        self.stack = []
+
+class Tracer:
+    """Per-request tracer; spans are no-ops for unsampled requests"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.service_name = 'catetube-api'
+        self._logger = None
+        self._listener = None
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('TRACING_ENABLED', False)
+        self.sample_rate = app.config.get('TRACE_SAMPLE_RATE', 0.1)
+        self.service_name = app.config.get('TRACE_SERVICE_NAME', self.service_name)
+        if not self.enabled:
+            return
+
+        self._setup_exporter(
+            app.config.get('TRACE_FILE', 'logs/traces.jsonl'),
+            app.config.get('TRACE_FILE_MAX_BYTES', 50 * 1024 * 1024)
+        )
+        app.before_request(self._start_request)
+        app.after_request(self._tag_response)
+        app.teardown_request(self._finish_request)
+
+        # Every bind: the primary plus any replicas and shards
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(engine, 'handle_error', self._handle_db_error)
+        app.logger.info(f"Tracing enabled (sample rate {self.sample_rate})")
+
+    def _setup_exporter(self, path, max_bytes):
+        """Write traces from a background thread, like the application log"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=5)
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+        self._logger = logging.getLogger('catetube.traces')
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._start_listener(file_handler)
+
+    def _start_listener(self, file_handler):
+        trace_queue = queue.Queue(maxsize=10000)
+        self._listener = QueueListener(trace_queue, file_handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+        self._logger.handlers = [QueueHandler(trace_queue)]
+
+    def reset_after_fork(self):
+        """New queue and writer thread in a forked worker (see worker_boot)"""
+        if self._listener is None:
+            return
+        atexit.unregister(self._listener.stop)
+        self._start_listener(*self._listener.handlers)
+
+    # -- spans -----------------------------------------------------------
+
+    def current_trace(self):
+        if not self.enabled or not has_request_context():
+            return None
+        return g.get('_trace')
+
+    def start_span(self, name, kind=SPAN_KIND_INTERNAL, **attributes):
+        """Open a child of the innermost open span; returns None when not tracing"""
+        trace = self.current_trace()
+        if trace is None:
+            return None
+        parent_id = trace.stack[-1].span_id if trace.stack else trace.parent_id
+        span = Span(trace.trace_id, parent_id, name, kind, attributes)
+        trace.spans.append(span)
+        trace.stack.append(span)
+        return span
+
+    def end_span(self, span, error=None):
+        if span is None:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = str(error)
+        trace = self.current_trace()
+        if trace is not None and span in trace.stack:
+            trace.stack.remove(span)
+
+    def annotate(self, key, value):
+        """Set an attribute on the innermost open span, if any"""
+        trace = self.current_trace()
+        if trace is not None and trace.stack:
+            trace.stack[-1].set_attribute(key, value)
+
+    @contextmanager
+    def span(self, name, kind=SPAN_KIND_INTERNAL, **attributes):
+        span = self.start_span(name, kind, **attributes)
+        if span is None:
+            yield None
+            return
+        try:
+            yield span
+        except Exception as e:
+            self.end_span(span, error=e)
+            raise
+        self.end_span(span)
+
+    # -- request hooks ---------------------------------------------------
+
+    def _start_request(self):
+        if not g.get('request_id'):
+            g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+        match = TRACEPARENT_RE.match(request.headers.get('traceparent', ''))
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = int(flags, 16) & 1
+        else:
+            trace_id = g.request_id if HEX32_RE.match(g.request_id) else uuid.uuid4().hex
+            parent_id = None
+            sampled = random.random() < self.sample_rate
+        if not sampled:
+            return
+
+        g._trace = Trace(trace_id, parent_id)
+        self.start_span(
+            f"{request.method} {request.url_rule or request.path}",
+            kind=SPAN_KIND_SERVER,
+            **{
+                'http.method': request.method,
+                'http.target': request.path,
+                'http.route': str(request.url_rule) if request.url_rule else None,
+                'request.id': g.request_id,
+            }
+        )
+
+    def _tag_response(self, response):
+        response.headers.setdefault('X-Request-ID', g.get('request_id', ''))
+        trace = g.get('_trace')
+        if trace is not None and trace.spans:
+            root = trace.spans[0]
+            root.set_attribute('http.status_code', response.status_code)
+            root.set_attribute('flask.endpoint', request.endpoint)
+            response.headers['traceparent'] = f"00-{trace.trace_id}-{root.span_id}-01"
+        return response
+
+    def _finish_request(self, exc=None):
+        trace = g.pop('_trace', None)
+        if trace is None or not trace.spans:
+            return
+        root = trace.spans[0]
+        self.end_span(root, error=exc)
+        user = g.get('_login_user')
+        if user is not None and getattr(user, 'is_authenticated', False):
+            root.set_attribute('enduser.id', user.id)
+        self._export(trace)
+
+    def _export(self, trace):
+        document = {
+            'resourceSpans': [{
+                'resource': {'attributes': [_attribute('service.name', self.service_name)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'catetube.tracing'},
+                    'spans': [span.to_otlp() for span in trace.spans]
+                }]
+            }]
+        }
+        try:
+            self._logger.info(json.dumps(document, separators=(',', ':')))
+        except Exception:
+            pass
+
+    # -- SQL -------------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        span = self.start_span(
+            'db.query', kind=SPAN_KIND_CLIENT,
+            **{'db.system': conn.dialect.name, 'db.statement': ' '.join(statement.split())[:1000]}
+        )
+        if span is not None:
+            conn.info.setdefault('_trace_spans', []).append(span)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('_trace_spans')
+        if spans:
+            span = spans.pop()
+            span.set_attribute('db.rows', cursor.rowcount if cursor.rowcount >= 0 else None)
+            self.end_span(span)
+
+    def _handle_db_error(self, context):
+        spans = context.connection.info.get('_trace_spans') if context.connection is not None else None
+        if spans:
+            self.end_span(spans.pop(), error=context.original_exception)
+
+# Global instance
+tracer = Tracer()
@@ -0,0 +1,49 @@
+from datetime import date
+from flask import current_app
+from app import cache
+from app.utils.serialization import serialize_rows
+
+# Regular entries are short-lived; pre-warmed ones must survive until the morning
+TRACKER_CACHE_TIMEOUT = 600
+WARM_CACHE_TIMEOUT = 24 * 3600
+
+def tracker_cache_key(user_id, target_date=None):
+    """Cache key for a user's tracker on a given day (today by default)"""
+    return f"tracker:{user_id}:{(target_date or date.today()).isoformat()}"
+
+def get_cached_tracker(user_id, target_date=None):
+    """Get a cached tracker dict, or None on a miss or cache failure"""
+    try:
+        return cache.get(tracker_cache_key(user_id, target_date))
+    except Exception as e:
+        current_app.logger.warning(f"Tracker cache read failed: {str(e)}")
+        return None
+
+def cache_tracker(tracker, timeout=TRACKER_CACHE_TIMEOUT):
+    """Store a tracker's dict form under its user/date key"""
+    try:
+        cache.set(tracker_cache_key(tracker.user_id, tracker.target_date), tracker.to_dict(), timeout=timeout)
+    except Exception as e:
+        current_app.logger.warning(f"Tracker cache write failed: {str(e)}")
+
+def invalidate_tracker(user_id, target_date=None):
+    """Drop a cached tracker after it changes"""
+    try:
+        cache.delete(tracker_cache_key(user_id, target_date))
+    except Exception as e:
+        current_app.logger.warning(f"Tracker cache invalidation failed: {str(e)}")
+
+def warm_trackers(trackers, timeout=WARM_CACHE_TIMEOUT):
+    """Cache many trackers in one round trip; returns how many were cached"""
+    mapping = {
+        tracker_cache_key(t.user_id, t.target_date): data
+        for t, data in zip(trackers, serialize_rows(trackers))
+    }
+    if not mapping:
+        return 0
+    try:
+        cache.set_many(mapping, timeout=timeout)
+    except Exception as e:
+        current_app.logger.warning(f"Tracker cache warm-up failed: {str(e)}")
+        return 0
+    return len(mapping)
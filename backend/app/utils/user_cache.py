@@ -0,0 +1,98 @@
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+from app import db, cache
+
+# Columns kept in the snapshot. password_hash is deliberately left out; it is
+# loaded from the database on first access (only the password routes need it).
+SNAPSHOT_FIELDS = [
+    'id', 'email', 'first_name', 'last_name', 'is_active', 'is_verified',
+    'created_at', 'last_login', 'timezone', 'cat_name', 'cat_breed',
+    'cat_age', 'cat_weight', 'daily_target_ml'
+]
+
+class UserSessionCache:
+    """Cache of the user row Flask-Login loads on every authenticated request.
+
+    Entries are plain snapshots of the user's columns kept in the shared
+    ``cache`` (in-process L1 in front of Redis), re-attached to the session
+    without a query, so routes keep working with a normal ``User`` instance.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('USER_CACHE_ENABLED', True)
+
+    @staticmethod
+    def cache_key(user_id):
+        return f"user:{user_id}"
+
+    def load(self, user_id):
+        """Load a user by id, from cache when possible"""
+        from app.models import User
+
+        if not self.enabled:
+            return User.query.get(user_id)
+
+        try:
+            snapshot = cache.get(self.cache_key(user_id))
+        except Exception as e:
+            current_app.logger.warning(f"User cache read failed: {str(e)}")
+            snapshot = None
+        if snapshot is not None:
+            self.hits += 1
+            return self._attach(snapshot)
+
+        self.misses += 1
+        user = User.query.get(user_id)
+        if user is not None:
+            snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+            try:
+                cache.set(self.cache_key(user_id), snapshot)
+            except Exception as e:
+                current_app.logger.warning(f"User cache write failed: {str(e)}")
+        return user
+
+    def invalidate(self, user_id):
+        """Forget a user after their row changes"""
+        try:
+            cache.delete(self.cache_key(user_id))
+        except Exception as e:
+            current_app.logger.warning(f"User cache invalidation failed: {str(e)}")
+
+    def invalidate_many(self, user_ids):
+        """Forget several users at once (bulk updates and deletes)"""
+        if not user_ids:
+            return
+        try:
+            cache.delete_many(*[self.cache_key(user_id) for user_id in user_ids])
+        except Exception as e:
+            current_app.logger.warning(f"User cache invalidation failed: {str(e)}")
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        total = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+        backend_stats = getattr(cache.cache, 'get_stats', None)
+        if backend_stats is not None:
+            stats['tiers'] = backend_stats()['namespaces'].get('user', {})
+        return stats
+
+    @staticmethod
+    def _attach(snapshot):
+        """Turn a snapshot back into a persistent User without querying"""
+        from app.models import User
+
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+# Global instance
+user_cache = UserSessionCache()
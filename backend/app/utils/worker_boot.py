@@ -0,0 +1,176 @@
+"""Worker start-up under gunicorn and Celery: pre-fork safety, warm-up and boot timing.
+
+With ``preload_app`` the app is created once in the gunicorn master and
+every worker (including replacements after ``max_requests``) is a fork of
+it. Sockets, pools and threads don't survive that fork, so in each worker
+``worker_started()`` (called from gunicorn.conf.py's post_worker_init):
+
+- drops inherited DB pools and Redis clients and resets limiter, cache and
+  load shedding state, and gives the log/trace writers new queues and threads;
+- starts background threads the master deferred (scheduler, activity
+  flush), since threads started before the fork would only run in the master;
+- opens a few pool connections per bind, connects Redis and runs the hot
+  queries once so their compiled SQL is cached before the first request;
+- logs how long all of that took and records it as a metric.
+
+Thread deferral is only on when DEFER_WORKER_THREADS is set, which
+gunicorn.conf.py does; the dev server, CLI and Celery start threads as before.
+
+Celery's prefork pool also forks the process that created the app, so each
+pool child gets the same reset and thread (re)starts from the
+worker_process_init signal (see celery_app.py), without the warm-up.
+"""
+
+import os
+import time
+from datetime import date
+from app.utils.metrics import record_worker_boot
+
+# Never a real user: hot queries run against it only to compile and cache their SQL
+WARM_UP_USER_ID = '00000000-0000-4000-8000-000000000000'
+
+
+def _limiter_storage(limiter):
+    """The limiter's storage, or None when it is disabled (``limiter.storage`` asserts then)"""
+    return getattr(limiter, '_storage', None) if limiter.enabled else None
+
+
+class WorkerBoot:
+    """Resets forked state, starts deferred threads and warms up a new worker"""
+
+    def __init__(self):
+        self.app = None
+        self.defer_threads = False
+        self.warm_connections = 2
+        self.boot = {}
+        self._db = None
+        self._starts = []
+
+    def init_app(self, app, db):
+        self.app = app
+        self._db = db
+        self.defer_threads = app.config.get('DEFER_WORKER_THREADS', False)
+        self.warm_connections = app.config.get('WARM_DB_CONNECTIONS', self.warm_connections)
+
+    def start_in_worker(self, start):
+        """Call ``start`` now (unless deferring) and again in each forked worker"""
+        self._starts.append(start)
+        if not self.defer_threads:
+            start()
+
+    def worker_started(self, forked_at=None, warm_up=True):
+        """Get a freshly forked worker ready to serve; returns the boot timings"""
+        started = time.perf_counter()
+        self.reset_after_fork()
+        reset_done = time.perf_counter()
+        # Deferred starts run for the first time; starts that already ran before
+        # the fork (Celery) bring back threads the fork left behind
+        for start in self._starts:
+            start()
+        threads_done = time.perf_counter()
+        warmed = self.warm_up() if warm_up else {}
+        ready = time.perf_counter()
+
+        self.boot = {
+            'pid': os.getpid(),
+            'load_ms': round((started - forked_at) * 1000, 1) if forked_at else None,
+            'reset_ms': round((reset_done - started) * 1000, 1),
+            'threads_ms': round((threads_done - reset_done) * 1000, 1),
+            'warm_up_ms': round((ready - threads_done) * 1000, 1),
+            'total_ms': round((ready - (forked_at or started)) * 1000, 1),
+            'warmed': warmed,
+        }
+        record_worker_boot(ready - (forked_at or started))
+        details = f"reset {self.boot['reset_ms']} ms"
+        if forked_at:
+            details = f"load {self.boot['load_ms']} ms, {details}"
+        if warm_up:
+            details += f", warm-up {self.boot['warm_up_ms']} ms: {warmed}"
+        self.app.logger.info(f"Worker {self.boot['pid']} ready in {self.boot['total_ms']:.0f} ms ({details})")
+        return self.boot
+
+    def reset_after_fork(self):
+        """Forget connections, locks and threads inherited from the master"""
+        from app import cache, limiter
+        from app.utils.activity import activity_recorder
+        from app.utils.db_routing import replica_router
+        from app.utils.load_shedding import load_shedder
+        from app.utils.logger import restart_log_listener
+        from app.utils.redis_client import reset_redis_client
+        from app.utils.tracing import tracer
+
+        with self.app.app_context():
+            for engine in self._db.engines.values():
+                # close=False: the sockets belong to the master, just stop using them
+                engine.dispose(close=False)
+        reset_redis_client()
+        for component in (_limiter_storage(limiter), getattr(cache, 'cache', None)):
+            if hasattr(component, 'reset_after_fork'):
+                component.reset_after_fork()
+        restart_log_listener(self.app)
+        tracer.reset_after_fork()
+        activity_recorder.reset_after_fork()
+        replica_router.reset_after_fork()
+        load_shedder.reset_after_fork()
+
+    def warm_up(self):
+        """Open pool connections, connect Redis and compile the hot queries.
+
+        Failures are logged and skipped: a worker that can't warm up still
+        serves, it just pays for the connections on its first requests.
+        """
+        from app import cache, limiter
+        from app.utils.passwords import password_hasher
+
+        warmed = {}
+        with self.app.app_context():
+            for key, engine in self._db.engines.items():
+                warmed[key or 'primary'] = self._attempt(self._open_connections, engine)
+            warmed['hot_queries'] = self._attempt(self._run_hot_queries)
+        for name, component in (('ratelimit', _limiter_storage(limiter)), ('cache', getattr(cache, 'cache', None))):
+            if hasattr(component, 'ping'):
+                warmed[name] = self._attempt(component.ping)
+        warmed['password_pool'] = self._attempt(password_hasher.warm_up)
+        return warmed
+
+    def _attempt(self, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            reason = str(e).splitlines()[0] if str(e) else repr(e)
+            self.app.logger.warning(f"Worker warm-up step {func.__name__} failed: {reason}")
+            return False
+
+    def _open_connections(self, engine):
+        """Check out (and return) several connections at once so the pool keeps them"""
+        connections = []
+        try:
+            for _ in range(self.warm_connections):
+                connection = engine.connect()
+                connections.append(connection)
+                connection.exec_driver_sql('SELECT 1')
+        finally:
+            for connection in connections:
+                connection.close()
+        return len(connections)
+
+    def _run_hot_queries(self):
+        """Run the per-request queries once; SQLAlchemy caches their compiled SQL per engine"""
+        from app.models import User, DailyFeedingTracker
+        from app.routes.dashboard import SECTION_LOADERS
+        from app.utils.sharding import shard_router
+
+        db = self._db
+        try:
+            db.session.get(User, WARM_UP_USER_ID)
+            for _ in shard_router.each_shard():
+                DailyFeedingTracker.query.filter_by(user_id=WARM_UP_USER_ID, target_date=date.today()).first()
+                for loader in SECTION_LOADERS.values():
+                    loader(WARM_UP_USER_ID)
+        finally:
+            db.session.remove()
+        return True
+
+
+# Global instance
+worker_boot = WorkerBoot()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Check worker startup import cost against a budget (exits 1 on regression).
+
+Usage:
+    python benchmarks/import_budget.py [--budget-ms MS] [--top N]
+
+Runs ``python -X importtime`` on ``create_app()`` in a fresh interpreter,
+fails if the total import time exceeds the budget (IMPORT_BUDGET_MS,
+default 1500) or if a module that must stay lazy (pandas, openpyxl,
+numpy) is imported at startup, and prints the most expensive imports.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed by report exports; importing them at startup is a regression
+LAZY_MODULES = ['pandas', 'openpyxl', 'numpy']
+
+STARTUP_CODE = "from app import create_app; create_app()"
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us, depth)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', 1500)))
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ, START_SCHEDULER='false', PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0 or not rows:
+        print(proc.stderr[-2000:])
+        print("FAIL: could not import the app")
+        return 1
+
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    imported = {name for name, _, _, _ in rows}
+
+    print(f"Top {args.top} imports by cumulative time:")
+    top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+    print(f"Total import time: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: startup imports exceed budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput for password verification.
+
+Usage:
+    python benchmarks/password_hashing.py [--method METHOD] [--logins N] [--concurrency N]
+
+Simulates a burst of concurrent logins (one thread per in-flight request)
+and reports logins/sec overall and per core, hashing inline and through
+PasswordHasher's process pool at several pool sizes.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.passwords import PasswordHasher, DEFAULT_METHOD
+
+
+def run_burst(hasher, stored_hash, logins, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as requests:
+        results = list(requests.map(lambda _: hasher.verify(stored_hash, 'CorrectHorse1'), range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default=DEFAULT_METHOD)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    stored_hash = PasswordHasher(method=args.method, workers=0).hash('CorrectHorse1')
+
+    print(f"Method: {args.method}  logins={args.logins}  concurrency={args.concurrency}  cores={cores}")
+    for workers in sorted({0, 1, 2, cores}):
+        hasher = PasswordHasher(method=args.method, workers=workers)
+        hasher.verify(stored_hash, 'CorrectHorse1')  # warm up the pool
+        rate = run_burst(hasher, stored_hash, args.logins, args.concurrency)
+        used_cores = max(1, min(workers, cores))
+        label = 'inline' if workers == 0 else f'pool={workers}'
+        print(f"  {label:<10} {rate:8.1f} logins/sec   {rate / used_cores:8.1f} logins/sec/core")
+        hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark model serialization and JSON encoding throughput.
+
+Usage:
+    python benchmarks/serialization.py [--rows N] [--repeat N]
+
+Compares the old hand-written to_dict() (method calls per row) against
+the compiled per-model serializers, and stdlib json against the
+orjson-backed FastJSONProvider.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app.models import FeedingLog, DailyFeedingTracker
+from app.utils.serialization import FastJSONProvider, serialize_rows, orjson
+
+
+def legacy_tracker_dict(t):
+    """to_dict() as it was before compiled serializers"""
+    return {
+        "id": t.id,
+        "target_date": t.target_date.isoformat(),
+        "daily_target_ml": t.daily_target_ml,
+        "remaining_ml": t.remaining_ml,
+        "total_fed_ml": t.total_fed_ml,
+        "feeding_count": t.feeding_count,
+        "progress_percentage": t.get_progress_percentage(),
+        "is_completed": t.is_completed(),
+        "is_overdue": t.is_overdue(),
+        "last_updated": t.last_updated.isoformat(),
+        "created_at": t.created_at.isoformat()
+    }
+
+
+def legacy_feeding_dict(log):
+    return {
+        "id": log.id,
+        "amount_ml": log.amount_ml,
+        "flushed_before": log.flushed_before,
+        "flushed_after": log.flushed_after,
+        "time_given": log.time_given.isoformat()
+    }
+
+
+def make_rows(n):
+    now = datetime.utcnow()
+    feedings, trackers = [], []
+    for i in range(n):
+        feedings.append(FeedingLog(id=i, user_id='00000000-0000-4000-8000-000000000000', amount_ml=30.0,
+                                   flushed_before=True, flushed_after=True, time_given=now - timedelta(minutes=i)))
+        tracker = DailyFeedingTracker(user_id='00000000-0000-4000-8000-000000000000',
+                                      target_date=date.today() - timedelta(days=i))
+        tracker.id = i
+        tracker.total_fed_ml = 120.0
+        tracker.feeding_count = 4
+        tracker.last_updated = now
+        tracker.created_at = now
+        trackers.append(tracker)
+    return feedings, trackers
+
+
+def measure(label, func, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<38} {rows / best:12,.0f} rows/sec")
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    feedings, trackers = make_rows(args.rows)
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    payload = serialize_rows(trackers)
+
+    print(f"rows={args.rows}  orjson={'yes' if orjson else 'no (stdlib fallback)'}")
+    print("Row -> dict")
+    measure("FeedingLog legacy to_dict", lambda: [legacy_feeding_dict(o) for o in feedings], args.rows, args.repeat)
+    measure("FeedingLog compiled serializer", lambda: serialize_rows(feedings), args.rows, args.repeat)
+    measure("DailyFeedingTracker legacy to_dict", lambda: [legacy_tracker_dict(o) for o in trackers], args.rows, args.repeat)
+    measure("DailyFeedingTracker compiled serializer", lambda: serialize_rows(trackers), args.rows, args.repeat)
+
+    print("dict -> JSON")
+    measure("stdlib json.dumps", lambda: json.dumps(payload, sort_keys=True), args.rows, args.repeat)
+    measure("FastJSONProvider.dumps", lambda: provider.dumps(payload), args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark user_id index size and lookup time: 36-char text vs compact UUID.
+
+Usage:
+    python benchmarks/uuid_keys.py [--database-url URL] [--users N] [--logs-per-user N] [--lookups N]
+
+Defaults to a throwaway SQLite file; point --database-url at a scratch
+Postgres database to measure the native ``uuid`` type.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from app.utils.db_types import GUID
+
+
+def build_tables(metadata, prefix, id_type):
+    users = sa.Table(
+        f'{prefix}_user', metadata,
+        sa.Column('id', id_type, primary_key=True),
+    )
+    logs = sa.Table(
+        f'{prefix}_log', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('user_id', id_type, nullable=False),
+        sa.Column('amount_ml', sa.Float, nullable=False),
+        sa.Index(f'ix_{prefix}_log_user_id', 'user_id'),
+    )
+    return users, logs
+
+
+def index_size_bytes(conn, index_name):
+    """Return on-disk size of an index, or None if the backend can't tell us"""
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(sa.text('SELECT pg_relation_size(:name)'), {'name': index_name}).scalar()
+    if conn.dialect.name == 'sqlite':
+        try:
+            return conn.execute(
+                sa.text('SELECT SUM(pgsize) FROM dbstat WHERE name = :name'), {'name': index_name}
+            ).scalar()
+        except sa.exc.OperationalError:
+            return None  # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+    return None
+
+
+def run_case(engine, prefix, id_type, user_ids, logs_per_user, lookups):
+    metadata = sa.MetaData()
+    users, logs = build_tables(metadata, prefix, id_type)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(users.insert(), [{'id': uid} for uid in user_ids])
+        conn.execute(logs.insert(), [
+            {'user_id': uid, 'amount_ml': 30.0}
+            for uid in user_ids for _ in range(logs_per_user)
+        ])
+        if conn.dialect.name == 'postgresql':
+            conn.execute(sa.text(f'ANALYZE {prefix}_log'))
+
+    rng = random.Random(42)
+    probe = [rng.choice(user_ids) for _ in range(lookups)]
+    stmt = sa.select(sa.func.count()).select_from(logs).where(logs.c.user_id == sa.bindparam('uid'))
+
+    with engine.connect() as conn:
+        size = index_size_bytes(conn, f'ix_{prefix}_log_user_id')
+        start = time.perf_counter()
+        for uid in probe:
+            conn.execute(stmt, {'uid': uid}).scalar()
+        elapsed = time.perf_counter() - start
+
+    metadata.drop_all(engine)
+    return size, elapsed / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--logs-per-user', type=int, default=20)
+    parser.add_argument('--lookups', type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp_path = None
+    url = args.database_url
+    if not url:
+        fd, tmp_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        url = f'sqlite:///{tmp_path}'
+
+    engine = sa.create_engine(url)
+    user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+
+    print(f"Backend: {engine.dialect.name}  users={args.users}  rows={args.users * args.logs_per_user}")
+    results = {}
+    for label, prefix, id_type in [
+        ('text (String(36))', 'bench_text', sa.String(36)),
+        ('compact (GUID)', 'bench_guid', GUID()),
+    ]:
+        results[label] = run_case(engine, prefix, id_type, user_ids, args.logs_per_user, args.lookups)
+        size, lookup_us = results[label]
+        size_str = f"{size / 1024:.0f} KiB" if size is not None else "n/a"
+        print(f"  {label:<20} index size: {size_str:>10}   lookup: {lookup_us:8.1f} us")
+
+    (text_size, text_us), (guid_size, guid_us) = results.values()
+    if text_size and guid_size:
+        print(f"Index size ratio (text / compact): {text_size / guid_size:.2f}x")
+    print(f"Lookup time ratio (text / compact): {text_us / guid_us:.2f}x")
+
+    engine.dispose()
+    if tmp_path:
+        os.remove(tmp_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Gunicorn settings for the production image (gunicorn -c gunicorn.conf.py run:app)"""
+
+import os
+import shutil
+import time
+
+bind = '0.0.0.0:5000'
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+# More than one thread switches to gthread workers (load shedding then sees
+# real in-flight counts, see app/utils/load_shedding.py)
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = 120
+keepalive = 2
+max_requests = 1000
+max_requests_jitter = 100
+
+# Import the app once in the master and fork workers from it, so recycled
+# workers (max_requests) start without re-importing anything. Workers then
+# reset inherited connections and start their own threads (post_worker_init).
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+os.environ.setdefault('DEFER_WORKER_THREADS', 'true')
+
+def on_starting(server):
+    """Start with an empty Prometheus multiprocess directory"""
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+def post_worker_init(worker):
+    """Reset state inherited from the master, start threads, warm up and log boot time"""
+    from app.utils.worker_boot import worker_boot
+    worker_boot.worker_started(getattr(worker, 'forked_at', None))
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that exited (max_requests recycles them)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,206 @@
+"""Minimal asyncio HTTP/1.1 client and latency recorder for the load tests.
+
+Standard library only, so the harness runs anywhere the backend does. Each
+virtual user owns one client (one connection, one cookie jar), like a
+browser tab; the connection is reopened whenever the server closes it
+(gunicorn's sync workers close after every response).
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+class HTTPError(Exception):
+    """Connection-level failure (refused, reset, timed out)"""
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class Client:
+    """One keep-alive connection with a cookie jar"""
+
+    def __init__(self, base_url, stats, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, method, path, body=None, name=None):
+        """Send a request and record its latency under ``name`` (default: the path)"""
+        name = name or f"{method} {path}"
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._request(method, path, body), self.timeout)
+        except (asyncio.TimeoutError, HTTPError, ConnectionError, OSError) as e:
+            await self.close()
+            self.stats.record(name, time.perf_counter() - start, None)
+            raise HTTPError(f"{name}: {e!r}") from e
+        self.stats.record(name, time.perf_counter() - start, response.status)
+        return response
+
+    async def _request(self, method, path, body):
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+            "Connection: keep-alive",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            headers.append("Content-Type: application/json")
+        if self.cookies:
+            headers.append("Cookie: " + '; '.join(f"{k}={v}" for k, v in self.cookies.items()))
+        raw = ('\r\n'.join(headers) + '\r\n\r\n').encode() + payload
+
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in (0, 1):
+            fresh = self._writer is None
+            if fresh:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self._writer.write(raw)
+                await self._writer.drain()
+                response = await self._read_response()
+                break
+            except (ConnectionError, asyncio.IncompleteReadError, HTTPError):
+                await self.close()
+                if fresh or attempt:
+                    raise HTTPError('connection closed')
+
+        if response.headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return response
+
+    async def _read_response(self):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise HTTPError('connection closed')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = (await self._reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            key, value = key.strip().lower(), value.strip()
+            if key == 'set-cookie':
+                cookie = value.split(';', 1)[0]
+                cookie_name, _, cookie_value = cookie.partition('=')
+                self.cookies[cookie_name.strip()] = cookie_value.strip()
+            headers[key] = value
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            # No length: the body runs until the server closes the connection
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+        return Response(status, headers, body)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Stats:
+    """Latencies and outcomes per route name"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, name, seconds, status):
+        self.latencies[name].append(seconds)
+        self.statuses[name][status or 'conn'] += 1
+        if status is None or status >= 500 or status == 429:
+            self.errors[name] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        """Per-route count, throughput, error rate and latency percentiles (ms)"""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        routes = {}
+        all_latencies = []
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            all_latencies.extend(ordered)
+            routes[name] = self._row(ordered, self.errors[name], elapsed)
+            routes[name]['statuses'] = {str(k): v for k, v in self.statuses[name].items()}
+        total = self._row(sorted(all_latencies), sum(self.errors.values()), elapsed)
+        return {'duration_seconds': round(elapsed, 1), 'routes': routes, 'total': total}
+
+    @staticmethod
+    def _row(ordered, errors, elapsed):
+        count = len(ordered)
+        return {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(ordered, 50) * 1000, 1),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 1),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 1),
+            'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0,
+        }
+
+
+def format_summary(summary):
+    """Fixed-width table of a Stats.summary()"""
+    header = f"{'route':<44} {'reqs':>7} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    lines = [header, '-' * len(header)]
+    rows = list(summary['routes'].items()) + [('TOTAL', summary['total'])]
+    for name, row in rows:
+        lines.append(
+            f"{name[:44]:<44} {row['requests']:>7} {row['rps']:>7.1f} {row['error_rate'] * 100:>5.1f}% "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+    lines.append(f"(latencies in ms over {summary['duration_seconds']}s)")
+    return '\n'.join(lines)
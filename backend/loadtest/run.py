@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Load test the API with realistic CatETube traffic and report latency per route.
+
+Usage:
+    # Self-contained: seeds users into a throwaway SQLite database and starts gunicorn
+    python loadtest/run.py --start-server --seed-users --users 200 --duration 300
+
+    # Against a server you started (seeding writes to the same DATABASE_URL)
+    DATABASE_URL=postgresql://... python loadtest/run.py --seed-users --url http://127.0.0.1:5000
+
+Each virtual user logs in and plays back compressed days (--day-seconds of
+wall time per simulated day, see scenarios.py): dashboard polling,
+feeding/medication bursts around meal times, a herd at every midnight and a
+few report exports. Traffic is generated from --seed, so runs with the same
+options are comparable. Prints p50/p95/p99 latency and throughput per route
+(--json writes the same numbers to a file) and exits 1 when the error rate
+(5xx, 429 and connection failures) is above --max-error-rate.
+
+Rate limits are turned off on a server started with --start-server; a
+server you run yourself should have RATELIMIT_ENABLED=false too, or logins
+from one IP will hit the per-IP limit. Run Redis as well when testing more
+than one worker; without it each worker caches report status separately.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from client import Client, Stats, format_summary
+from scenarios import SimClock, VirtualUser, build_timeline, make_rng
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMAIL_TEMPLATE = 'loadtest-{:05d}@example.com'
+
+
+def seed_users(count, password):
+    """Create the load-test users directly in DATABASE_URL; returns how many were added"""
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app, db
+    from app.models import User
+    from app.utils.passwords import password_hasher
+    from app.utils.sharding import shard_router
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if shard_router.enabled:
+            shard_router.create_tables()
+        existing = {email for (email,) in db.session.query(User.email).filter(User.email.like('loadtest-%'))}
+        # Everyone shares a password, so hash it once rather than per user
+        password_hash = password_hasher.hash(password)
+        users = [
+            User(email=EMAIL_TEMPLATE.format(i), password_hash=password_hash, first_name='Load',
+                 last_name=f'Test {i}', cat_name=f'Cat {i}', daily_target_ml=210.0, is_verified=True)
+            for i in range(count) if EMAIL_TEMPLATE.format(i) not in existing
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+    return len(users)
+
+
+def wait_for_health(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {url} did not become healthy within {timeout:.0f}s")
+
+
+def start_server(url, workers, log_path):
+    """Run gunicorn with the production config on the --url port"""
+    port = urlsplit(url).port or 80
+    log = open(log_path, 'ab')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), 'run:app'],
+        cwd=BACKEND_DIR, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        wait_for_health(url)
+    except Exception:
+        process.terminate()
+        raise
+    return process
+
+
+async def run_load(options):
+    login_stats = Stats()
+    users = [
+        VirtualUser(Client(options.url, login_stats, timeout=options.timeout),
+                    EMAIL_TEMPLATE.format(i), options.password, make_rng(options.seed, i))
+        for i in range(options.users)
+    ]
+
+    # Logins hash passwords; ramp them up before the measured part of the run
+    limit = asyncio.Semaphore(options.login_concurrency)
+
+    async def login(user):
+        async with limit:
+            await user.login()
+
+    await asyncio.gather(*(login(user) for user in users))
+    login_stats.stop()
+
+    clock = SimClock(options.day_seconds, options.start_hour)
+    timelines = [build_timeline(user.rng, clock, options) for user in users]
+    stats = Stats()
+    for user in users:
+        user.client.stats = stats
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user.run(timeline, started) for user, timeline in zip(users, timelines)))
+    stats.stop()
+    await asyncio.gather(*(user.client.close() for user in users))
+    return login_stats.summary(), stats.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=120, help='measured seconds after login')
+    parser.add_argument('--day-seconds', type=float, default=60, help='wall seconds per simulated day')
+    parser.add_argument('--start-hour', type=float, default=6, help='simulated hour the run starts at')
+    parser.add_argument('--poll-interval', type=float, default=15, help='seconds between dashboard polls')
+    parser.add_argument('--feed-probability', type=float, default=0.9, help='chance a user feeds at each meal')
+    parser.add_argument('--medication-users', type=float, default=0.4, help='share of users logging medications')
+    parser.add_argument('--report-users', type=float, default=0.05, help='share of users exporting a report')
+    parser.add_argument('--midnight-spread', type=float, default=2.0, help='seconds the midnight herd arrives over')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--password', default='LoadTest123!')
+    parser.add_argument('--login-concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--seed-users', action='store_true', help='create the users in DATABASE_URL first')
+    parser.add_argument('--start-server', action='store_true', help='run gunicorn for the duration of the test')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers with --start-server')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    options = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix='catetube-loadtest-') as tmp:
+        if options.start_server:
+            os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tmp, 'loadtest.db')}")
+            os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tmp, 'prometheus'))
+            os.environ['RATELIMIT_ENABLED'] = 'false'
+            os.environ['START_SCHEDULER'] = 'false'
+
+        if options.seed_users:
+            added = seed_users(options.users, options.password)
+            print(f"Seeded {added} users ({options.users - added} already existed)")
+
+        try:
+            if options.start_server:
+                log_path = os.path.join(BACKEND_DIR, 'logs', 'loadtest-server.log')
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                server = start_server(options.url, options.workers, log_path)
+                print(f"gunicorn ({options.workers} workers) on {options.url}, log in {log_path}")
+
+            print(f"{options.users} users, {options.duration:.0f}s, {options.day_seconds:.0f}s per simulated day, seed {options.seed}")
+            login_summary, summary = asyncio.run(run_load(options))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    login = login_summary['total']
+    print(f"\nLogins: {login['requests']} in {login_summary['duration_seconds']}s "
+          f"(p50 {login['p50_ms']} ms, p99 {login['p99_ms']} ms, {login['errors']} errors)\n")
+    print(format_summary(summary))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'options': vars(options), 'login': login_summary, 'results': summary}, f, indent=2)
+
+    error_rate = summary['total']['error_rate']
+    if error_rate > options.max_error_rate:
+        print(f"\nFAIL: error rate {error_rate:.2%} is above {options.max_error_rate:.2%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
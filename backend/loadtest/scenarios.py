@@ -0,0 +1,169 @@
+"""What the virtual users do.
+
+A run plays back compressed days (``day_seconds`` of wall time per simulated
+day). Every user gets a timeline built up front from a seeded RNG, so the same
+options always produce the same traffic:
+
+- dashboard polling every ``poll_interval`` seconds (jittered), with the odd
+  tracker, history or feeding-list read in between;
+- feedings clustered around meal times and medications around dosing times;
+- a thundering herd at every simulated midnight, when every open tab reloads
+  its tracker and dashboard at once (new day, cold cache entries);
+- a few users exporting a report, polling its status and downloading it.
+"""
+
+import asyncio
+import random
+import time
+
+from client import HTTPError
+
+MEAL_HOURS = (7, 12, 18, 22)
+MEDICATION_HOURS = (8, 20)
+MEAL_SPREAD_MINUTES = 20
+FEEDING_AMOUNTS = (30, 40, 50, 60, 70)
+REPORT_TYPES = ('feeding', 'medication', 'combined')
+
+
+class SimClock:
+    """Maps simulated hours of the day to wall-clock offsets from the start"""
+
+    def __init__(self, day_seconds, start_hour):
+        self.day_seconds = day_seconds
+        self.start_hour = start_hour
+
+    def offsets(self, hour, duration):
+        """Wall-clock offsets in [0, duration) at which the simulated clock reads ``hour``"""
+        first = ((hour - self.start_hour) % 24) / 24 * self.day_seconds
+        offsets = []
+        while first < duration:
+            offsets.append(first)
+            first += self.day_seconds
+        return offsets
+
+    def minutes(self, simulated_minutes):
+        return simulated_minutes / (24 * 60) * self.day_seconds
+
+
+def build_timeline(rng, clock, options):
+    """(offset_seconds, action) pairs for one user, in time order"""
+    duration = options.duration
+    events = []
+
+    t = rng.uniform(0, options.poll_interval)
+    while t < duration:
+        events.append((t, 'dashboard'))
+        roll = rng.random()
+        if roll < 0.15:
+            events.append((t + rng.uniform(1, 3), 'tracker_today'))
+        elif roll < 0.25:
+            events.append((t + rng.uniform(1, 3), 'tracker_history'))
+        elif roll < 0.30:
+            events.append((t + rng.uniform(1, 3), 'list_feedings'))
+        t += options.poll_interval * rng.uniform(0.8, 1.2)
+
+    for hour in MEAL_HOURS:
+        for offset in clock.offsets(hour, duration):
+            if rng.random() < options.feed_probability:
+                events.append((offset + clock.minutes(rng.gauss(0, MEAL_SPREAD_MINUTES)), 'feed'))
+
+    if rng.random() < options.medication_users:
+        for hour in MEDICATION_HOURS:
+            for offset in clock.offsets(hour, duration):
+                events.append((offset + clock.minutes(rng.gauss(0, MEAL_SPREAD_MINUTES)), 'medication'))
+
+    for offset in clock.offsets(0, duration):
+        events.append((offset + rng.uniform(0, options.midnight_spread), 'midnight'))
+
+    if rng.random() < options.report_users:
+        events.append((rng.uniform(0, duration * 0.8), 'report'))
+
+    return sorted((max(0.0, t), action) for t, action in events if t < duration)
+
+
+class VirtualUser:
+    """One logged-in browser tab"""
+
+    def __init__(self, client, email, password, rng):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.rng = rng
+
+    async def login(self):
+        response = await self.client.request('POST', '/api/auth/login', {
+            'email': self.email, 'password': self.password, 'remember_me': True
+        })
+        if response.status != 200:
+            raise RuntimeError(f"Login failed for {self.email}: {response.status} {response.body[:200]!r}")
+
+    async def run(self, timeline, started):
+        for offset, action in timeline:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await getattr(self, action)()
+            except HTTPError:
+                pass  # already counted; carry on like a user hitting refresh
+
+    async def dashboard(self):
+        await self.client.request('GET', '/api/dashboard/')
+
+    async def tracker_today(self):
+        await self.client.request('GET', '/api/tracker/today')
+
+    async def tracker_history(self):
+        await self.client.request('GET', '/api/tracker/history?days=7', name='GET /api/tracker/history')
+
+    async def list_feedings(self):
+        await self.client.request('GET', '/api/feeding/?page=1&per_page=20', name='GET /api/feeding/')
+
+    async def feed(self):
+        await self.client.request('POST', '/api/feeding/', {
+            'amount_ml': self.rng.choice(FEEDING_AMOUNTS),
+            'flushed_before': True,
+            'flushed_after': True,
+        })
+        # The app refreshes the tracker after logging
+        await self.client.request('GET', '/api/tracker/today')
+
+    async def medication(self):
+        await self.client.request('POST', '/api/medication_log/', {
+            'medication_name': self.rng.choice(('Mirtazapine', 'Maropitant', 'Famotidine')),
+            'dosage': self.rng.choice(('1 tablet', '2mg', '0.5ml')),
+            'amount_ml': self.rng.choice((2, 3, 5)),
+            'route': 'E-tube',
+        })
+
+    async def midnight(self):
+        await self.client.request('GET', '/api/tracker/today')
+        await self.client.request('GET', '/api/dashboard/')
+
+    async def report(self, poll_seconds=1.0, max_polls=120):
+        report_type = self.rng.choice(REPORT_TYPES)
+        response = await self.client.request(
+            'POST', f'/api/report/{report_type}', {'format': self.rng.choice(('csv', 'json'))},
+            name='POST /api/report/<type>'
+        )
+        if response.status != 202:
+            return
+        report_id = response.json()['report_id']
+        for _ in range(max_polls):
+            await asyncio.sleep(poll_seconds)
+            status = await self.client.request(
+                'GET', f'/api/report/status/{report_id}', name='GET /api/report/status/<id>'
+            )
+            body = status.json() or {}
+            if body.get('status') == 'completed':
+                await self.client.request(
+                    'GET', f'/api/report/download/{report_id}', name='GET /api/report/download/<id>'
+                )
+                return
+            if status.status != 200 or body.get('status') == 'error':
+                return
+
+
+def make_rng(seed, index):
+    """Independent, reproducible RNG per virtual user"""
+    return random.Random(seed * 1_000_003 + index)
@@ -0,0 +1,97 @@
+"""Store user ids as native UUID (16 bytes) instead of 36-char text
+
+Revision ID: 5f1d2c7a9e3b
+Revises: cbe554bd1735
+Create Date: 2026-10-18 09:12:44.120931
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1d2c7a9e3b'
+down_revision = 'cbe554bd1735'
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs holding a user id
+USER_ID_COLUMNS = [
+    ('user', 'id'),
+    ('feeding_log', 'user_id'),
+    ('medication_log', 'user_id'),
+    ('daily_feeding_tracker', 'user_id'),
+]
+CHILD_TABLES = ['feeding_log', 'medication_log', 'daily_feeding_tracker']
+
+
+def _drop_foreign_keys():
+    for table in CHILD_TABLES:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_user_id_fkey')
+
+
+def _create_foreign_keys():
+    for table in CHILD_TABLES:
+        op.create_foreign_key(f'{table}_user_id_fkey', table, 'user', ['user_id'], ['id'])
+
+
+def _rewrite_values(table, column, convert):
+    """Rewrite every value of a column in Python (used where SQL casts are unavailable)"""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(f'SELECT DISTINCT "{column}" FROM "{table}"')).fetchall()
+    for (value,) in rows:
+        if value is None:
+            continue
+        conn.execute(
+            sa.text(f'UPDATE "{table}" SET "{column}" = :new WHERE "{column}" = :old'),
+            {'new': convert(value), 'old': value}
+        )
+
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        if len(value) == 16:
+            return value
+        value = value.decode('ascii')
+    return uuid.UUID(value).bytes
+
+
+def _to_text(value):
+    if isinstance(value, (bytes, bytearray, memoryview)) and len(bytes(value)) == 16:
+        return str(uuid.UUID(bytes=bytes(value)))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('ascii')
+    return str(value)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _drop_foreign_keys()
+        for table, column in USER_ID_COLUMNS:
+            op.execute(f'ALTER TABLE "{table}" ALTER COLUMN {column} TYPE uuid USING {column}::uuid')
+        _create_foreign_keys()
+        return
+
+    for table, column in USER_ID_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.String(length=36), type_=sa.LargeBinary(length=16))
+        _rewrite_values(table, column, _to_bytes)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _drop_foreign_keys()
+        for table, column in USER_ID_COLUMNS:
+            op.alter_column(table, column, existing_type=postgresql.UUID(), type_=sa.String(length=36),
+                            postgresql_using=f'{column}::text')
+        _create_foreign_keys()
+        return
+
+    for table, column in USER_ID_COLUMNS:
+        _rewrite_values(table, column, _to_text)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.LargeBinary(length=16), type_=sa.String(length=36))
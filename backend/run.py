@@ -3,6 +3,9 @@ from flask import request
 
 app = create_app()
 
+# Celery worker entry point: celery -A run.celery worker
+celery = app.extensions['celery']
+
 @app.before_request
 def log_request():
     # print(f"{request.method} {request.path}")
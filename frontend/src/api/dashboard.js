@@ -0,0 +1,17 @@
+import axios from 'axios';
+
+const DASHBOARD_API = 'http://localhost:8000/api/dashboard/';
+
+// Configure axios to include credentials for session management
+axios.defaults.withCredentials = true;
+
+// User, today's tracker, recent feedings/medications and stats in one request
+export async function getDashboard() {
+  try {
+    const response = await axios.get(DASHBOARD_API);
+    return response.data;
+  } catch (error) {
+    const message = error.response?.data?.error || 'Failed to load dashboard';
+    throw new Error(message);
+  }
+}
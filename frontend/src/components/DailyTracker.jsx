@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { getTodayTracker, createOrUpdateTodayTracker, resetTracker, getTrackerStats } from '../api/tracker';
+import { getTodayTracker, createOrUpdateTodayTracker, resetTracker } from '../api/tracker';
+import { getDashboard } from '../api/dashboard';
 
 export default function DailyTracker() {
   const [tracker, setTracker] = useState(null);
@@ -10,34 +11,40 @@ export default function DailyTracker() {
   const [showSettings, setShowSettings] = useState(false);
 
   useEffect(() => {
-    loadTracker();
-    loadStats();
+    loadDashboard();
     
     // Refresh tracker every 30 seconds
     const interval = setInterval(loadTracker, 30000);
     return () => clearInterval(interval);
   }, []);
 
-  const loadTracker = async () => {
+  // Initial load: tracker and stats come back together from /api/dashboard
+  const loadDashboard = async () => {
     try {
-      const data = await getTodayTracker();
-      setTracker(data);
-      setDailyTarget(data.daily_target_ml);
+      const data = await getDashboard();
+      setTracker(data.tracker);
+      setDailyTarget(data.tracker.daily_target_ml);
+      setStats(data.stats);
       setError('');
     } catch (err) {
       setError(`Failed to load tracker: ${err.message}`);
-      console.error('Tracker load error:', err);
+      console.error('Dashboard load error:', err);
     } finally {
       setLoading(false);
     }
   };
 
-  const loadStats = async () => {
+  const loadTracker = async () => {
     try {
-      const data = await getTrackerStats();
-      setStats(data);
+      const data = await getTodayTracker();
+      setTracker(data);
+      setDailyTarget(data.daily_target_ml);
+      setError('');
     } catch (err) {
-      console.error('Stats load error:', err);
+      setError(`Failed to load tracker: ${err.message}`);
+      console.error('Tracker load error:', err);
+    } finally {
+      setLoading(false);
     }
   };
 